@@ -6,7 +6,7 @@
     'name':
         'Online Bank Statements: PrivatBank Ukraine (ПриватБанк Україна)'
         ' InterPay',
-    'version': '12.0.1.1.0',
+    'version': '12.0.1.2.0',
     'author':
         'CorporateHub, '
         'Odoo Community Association (OCA)',
@@ -19,7 +19,11 @@
         'account_bank_statement_import_online',
     ],
     'data': [
+        'security/ir.model.access.csv',
+        'data/ir_cron.xml',
         'views/online_bank_statement_provider.xml',
+        'wizards/online_bank_statement_pull_wizard.xml',
+        'wizards/ua_pb_interpay_export_import_wizard.xml',
     ],
     'installable': True,
 }
@@ -1,3 +1,5 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 from . import online_bank_statement_provider_ua_pb_interpay
+from . import ua_pb_interpay_report_page
+from . import ua_pb_interpay_rate_bucket
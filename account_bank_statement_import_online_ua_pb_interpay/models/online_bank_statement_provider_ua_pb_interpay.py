@@ -2,39 +2,1769 @@
 # Copyright 2020 CorporateHub (https://corporatehub.eu)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
 
+import asyncio
 from base64 import b64decode
+import codecs
+import csv
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
+import heapq
+from html import escape
+from operator import attrgetter
+import http.client
+from io import BytesIO, TextIOWrapper
 import itertools
 import json
 import hashlib
+import logging
+import os
+import random
+import re
+import socket
 import ssl
+import sys
 from tempfile import NamedTemporaryFile
+import threading
+import time
 from pytz import timezone, utc
-from urllib.error import HTTPError
+from urllib.error import HTTPError, URLError
 from urllib.parse import urlparse
 from urllib.request import Request, urlopen
 from uuid import uuid4
 
-from odoo import api, models, _
-from odoo.exceptions import UserError
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
 
 UA_PB_INTERPAY_API_BASE = \
     'https://interpay.privatbank.ua/inter-pay-service/api'
 UA_PB_TIMEZONE = timezone('Europe/Kiev')
 UA_PB_TIMESTAMP_BASE = datetime(1970, 1, 1, tzinfo=UA_PB_TIMEZONE)
+# NOTE: Base above has a fixed UTC offset (local mean time of Kiev), thus
+# timestamps are converted with plain integer math
+UA_PB_TIMESTAMP_OFFSET = \
+    UA_PB_TIMESTAMP_BASE.utcoffset() // timedelta(milliseconds=1)
+UA_PB_EPOCH = datetime(1970, 1, 1)
+UA_PB_INTERPAY_TIMEOUT = 60
+UA_PB_INTERPAY_MAX_CONCURRENCY = 8
+UA_PB_INTERPAY_PAGE_SIZE = 1000
+UA_PB_INTERPAY_MAX_PAGE_SIZE = 5000
+UA_PB_INTERPAY_MAX_WINDOW_SIZE = 30
+UA_PB_INTERPAY_MAX_WINDOW_PAGES = 4
+UA_PB_INTERPAY_RETRIES = 4
+UA_PB_INTERPAY_RETRY_STATUSES = {429, 500, 502, 503, 504}
+UA_PB_INTERPAY_BACKOFF = 0.5
+UA_PB_INTERPAY_MAX_BACKOFF = 30.0
+UA_PB_INTERPAY_CHECKPOINT_TTL = timedelta(hours=1)
+UA_PB_INTERPAY_SCHEDULER_WORKERS = 4
+UA_PB_INTERPAY_BULK_SIZE = 1000
+# NOTE: Backfill runs start no more windows after this many seconds, to stay
+# within time limit of a cron worker
+UA_PB_INTERPAY_BACKFILL_DURATION = 60
+UA_PB_INTERPAY_EXPORT_CHUNK_SIZE = 64 * 1024
+# NOTE: JSON decoder accepts bytes only since Python 3.6
+UA_PB_INTERPAY_JSON_BYTES = sys.version_info >= (3, 6)
+UA_PB_INTERPAY_SESSION_FIELDS = {
+    'api_base',
+    'username',
+    'password',
+    'certificate',
+    'passphrase',
+    'ua_pb_interpay_concurrency',
+    'ua_pb_interpay_rate_limit',
+}
+UA_PB_INTERPAY_SSL_CONTEXT_FIELDS = {
+    'certificate',
+    'passphrase',
+}
+# NOTE: Fields of both payment and refill schemas, in order of precedence
+UA_PB_INTERPAY_DATE_FIELDS = ('DATECREATE', 'REFILLDATE')
+UA_PB_INTERPAY_TIMESTAMP_FIELDS = ('DATECREATE', 'DATECHANGE', 'REFILLDATE')
+UA_PB_INTERPAY_DESCRIPTION_FIELDS = ('DESCRIPTION', 'REFILLDESCR')
+UA_PB_INTERPAY_REF_FIELDS = ('PAYMENTREF', 'REFILLREF')
+UA_PB_INTERPAY_DEBIT_AMOUNT_FIELD = 'AMTDEBIT'
+UA_PB_INTERPAY_CREDIT_AMOUNT_FIELD = 'REFILLAMT'
+UA_PB_INTERPAY_OUR_ACCOUNT_FIELDS = ('REFILLCREDACC', 'EXTACC')
+UA_PB_INTERPAY_PARTNER_ACCOUNT_FIELDS = ('REFILLDEBACC', 'ACC2600', 'CARD')
+# NOTE: Normalizing hooks replaced by _ua_pb_interpay_normalize_page(), it's
+# used only if none of them is overridden
+UA_PB_INTERPAY_TRANSACTION_HOOKS = (
+    '_ua_pb_interpay_string',
+    '_ua_pb_interpay_decimal',
+    '_ua_pb_interpay_preparse_transaction',
+    '_ua_pb_interpay_timestamp_to_epoch',
+    '_ua_pb_interpay_transaction_to_lines',
+    '_ua_pb_interpay_filter_transaction',
+    '_ua_pb_interpay_get_transaction_date',
+    '_ua_pb_interpay_get_transaction_description',
+    '_ua_pb_interpay_get_transaction_ref',
+    '_ua_pb_interpay_get_transaction_amount',
+    '_ua_pb_interpay_get_our_account_number',
+    '_ua_pb_interpay_get_partner_bank_account',
+)
+
+_ua_pb_interpay_sessions = {}
+_ua_pb_interpay_sessions_lock = threading.Lock()
+_ua_pb_interpay_ssl_contexts = {}
+_ua_pb_interpay_ssl_contexts_lock = threading.Lock()
+_ua_pb_interpay_rate_limiters = {}
+_ua_pb_interpay_rate_limiters_lock = threading.Lock()
+_ua_pb_interpay_pull_stats = {}
+_ua_pb_interpay_pull = threading.local()
+
+
+class UaPbInterpayResponse(object):
+    def __init__(self, status, reason, headers, content, read_time=0.0):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        # NOTE: Content is read ahead, time spent on reading it is reported
+        self.read_time = read_time
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def read(self):
+        return self.content
+
+
+class UaPbInterpayDigestAuth(object):
+    """Digest challenge along with the hasher and HA1 resolved for it, so
+    that signing a request only takes hashing A2 and the response"""
+
+    def __init__(self, authenticate, hasher, ha1):
+        self.authenticate = authenticate
+        self.hasher = hasher
+        self.cnonce = uuid4().hex[0:16]
+        if authenticate['algorithm'].endswith('-sess'):
+            ha1 = self.hash('%s:%s:%s' % (
+                ha1,
+                authenticate['nonce'],
+                self.cnonce,
+            ))
+        self.ha1 = ha1
+
+    def hash(self, value):
+        hasher = self.hasher.copy()
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        hasher.update(value)
+        return hasher.hexdigest()
+
+
+class UaPbInterpaySession(object):
+    """Keep-alive connections and Digest challenge of a single provider"""
+
+    def __init__(self, concurrency=1, rate_limiter=None):
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._rate_limiter = rate_limiter
+        self.handshake_lock = threading.Lock()
+        self.context = None
+        self.digest_auth = None
+        self.nonce_count = 0
+        # NOTE: Credentials digest, hasher and HA1 per realm and algorithm
+        self.realms = {}
+
+    def set_digest_auth(self, digest_auth):
+        with self._lock:
+            self.digest_auth = digest_auth
+            self.nonce_count = 0
+
+    def next_nonce_count(self):
+        with self._lock:
+            self.nonce_count += 1
+            return self.digest_auth, '%08x' % (self.nonce_count,)
+
+    def urlopen(self, request, context=None, timeout=UA_PB_INTERPAY_TIMEOUT):
+        # NOTE: Wait for a token before taking a slot, not to hold it idle
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+        with self._slots:
+            return self._urlopen(request, context, timeout)
+
+    def _urlopen(self, request, context, timeout):
+        url = urlparse(request.full_url)
+        key = (url.scheme, url.netloc)
+        if context is not self.context:
+            # NOTE: Idle connections were established with another certificate
+            self.close()
+            self.context = context
+        while True:
+            connection = self._acquire(key, context, timeout)
+            # NOTE: Idle connection might have been closed by the server
+            reused = connection.sock is not None
+            try:
+                connection.request(
+                    request.get_method(),
+                    request.selector,
+                    request.data,
+                    dict(request.header_items()),
+                )
+                response = connection.getresponse()
+                read_started = time.perf_counter()
+                content = response.read()
+                read_time = time.perf_counter() - read_started
+            except (ConnectionError, http.client.BadStatusLine):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+            self._release(key, connection)
+            break
+        if response.status >= 400:
+            raise HTTPError(
+                request.full_url,
+                response.status,
+                response.reason,
+                response.headers,
+                BytesIO(content),
+            )
+        return UaPbInterpayResponse(
+            response.status,
+            response.reason,
+            response.headers,
+            content,
+            read_time,
+        )
+
+    def close(self):
+        with self._lock:
+            connections = list(itertools.chain.from_iterable(
+                self._connections.values()
+            ))
+            self._connections = {}
+        for connection in connections:
+            connection.close()
+
+    def _acquire(self, key, context, timeout):
+        with self._lock:
+            connections = self._connections.get(key)
+            if connections:
+                return connections.pop()
+        scheme, netloc = key
+        if scheme == 'http':
+            return http.client.HTTPConnection(netloc, timeout=timeout)
+        return http.client.HTTPSConnection(
+            netloc,
+            timeout=timeout,
+            context=context,
+        )
+
+    def _release(self, key, connection):
+        with self._lock:
+            self._connections.setdefault(key, []).append(connection)
+
+
+class UaPbInterpayAsyncSlot(object):
+    """Requests are sent only while holding a slot"""
+
+    def __init__(self, slots, rate_limiter=None):
+        self._slots = slots
+        self._rate_limiter = rate_limiter
+
+    async def __aenter__(self):
+        # NOTE: Wait for a token before taking a slot, not to hold it idle
+        if self._rate_limiter is not None:
+            while True:
+                delay = self._rate_limiter.try_acquire()
+                if not delay:
+                    break
+                await asyncio.sleep(delay)
+        await self._slots.acquire()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._slots.release()
+
+
+class UaPbInterpayAsyncSession(object):
+    """Keep-alive connections of a single provider within an event loop,
+    Digest challenge is shared with the session of the provider"""
+
+    def __init__(self, session, concurrency=1, rate_limiter=None):
+        self.session = session
+        self._connections = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._rate_limiter = rate_limiter
+        self.handshake_lock = asyncio.Lock()
+
+    def slot(self):
+        return UaPbInterpayAsyncSlot(self._slots, self._rate_limiter)
+
+    async def urlopen(
+            self, request, context=None, timeout=UA_PB_INTERPAY_TIMEOUT):
+        url = urlparse(request.full_url)
+        key = (url.scheme, url.netloc)
+        while True:
+            connection, reused = await self._acquire(url, context, timeout)
+            reader, writer = connection
+            try:
+                writer.write(self._encode_request(request, url.netloc))
+                await self._wait(writer.drain(), timeout)
+                status, reason, headers, content, read_time, keep_alive = \
+                    await self._read_response(reader, timeout)
+            except (ConnectionError, asyncio.IncompleteReadError,
+                    http.client.BadStatusLine) as e:
+                writer.close()
+                if reused:
+                    continue
+                if isinstance(e, asyncio.IncompleteReadError):
+                    raise ConnectionResetError(
+                        'Remote end closed connection without response'
+                    ) from e
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._connections.setdefault(key, []).append(connection)
+            else:
+                writer.close()
+            break
+        if status >= 400:
+            raise HTTPError(
+                request.full_url,
+                status,
+                reason,
+                headers,
+                BytesIO(content),
+            )
+        return UaPbInterpayResponse(
+            status,
+            reason,
+            headers,
+            content,
+            read_time,
+        )
+
+    async def close(self):
+        connections = list(itertools.chain.from_iterable(
+            self._connections.values()
+        ))
+        self._connections = {}
+        for _reader, writer in connections:
+            writer.close()
+        for _reader, writer in connections:
+            # NOTE: StreamWriter.wait_closed() is available since Python 3.7
+            if not hasattr(writer, 'wait_closed'):
+                continue
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _acquire(self, url, context, timeout):
+        connections = self._connections.get((url.scheme, url.netloc))
+        if connections:
+            return connections.pop(), True
+        if url.scheme == 'http':
+            connecting = asyncio.open_connection(url.hostname, url.port or 80)
+        else:
+            connecting = asyncio.open_connection(
+                url.hostname,
+                url.port or 443,
+                ssl=context or True,
+            )
+        return await self._wait(connecting, timeout), False
+
+    @staticmethod
+    async def _wait(awaitable, timeout):
+        # NOTE: Same as socket timeout, applies to every network operation
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            raise socket.timeout('timed out')
+
+    @staticmethod
+    def _encode_request(request, netloc):
+        data = request.data or b''
+        headers = [
+            ('Host', netloc),
+            ('Accept-Encoding', 'identity'),
+            ('Content-Length', str(len(data))),
+        ] + request.header_items()
+        return ('%s %s HTTP/1.1\r\n%s\r\n\r\n' % (
+            request.get_method(),
+            request.selector,
+            '\r\n'.join('%s: %s' % header for header in headers),
+        )).encode('latin-1') + data
+
+    async def _read_response(self, reader, timeout):
+        head = await self._wait(reader.readuntil(b'\r\n\r\n'), timeout)
+        status_line, _sep, head = head.partition(b'\r\n')
+        try:
+            version, status, reason = (
+                status_line.decode('latin-1').split(None, 2) + ['']
+            )[0:3]
+            status = int(status)
+        except ValueError:
+            raise http.client.BadStatusLine(status_line)
+        headers = http.client.parse_headers(BytesIO(head))
+
+        read_started = time.perf_counter()
+        keep_alive = version == 'HTTP/1.1' \
+            and headers.get('Connection', '').lower() != 'close'
+        if status < 200 or status in (204, 304):
+            content = b''
+        elif 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            chunks = []
+            while True:
+                size = await self._wait(reader.readline(), timeout)
+                size = int(size.split(b';', 1)[0], 16)
+                if not size:
+                    break
+                chunk = await self._wait(reader.readexactly(size + 2), timeout)
+                chunks.append(chunk[0:-2])
+            # NOTE: Skip trailers
+            while (await self._wait(reader.readline(), timeout)).strip():
+                pass
+            content = b''.join(chunks)
+        elif headers.get('Content-Length') is not None:
+            content = await self._wait(
+                reader.readexactly(int(headers['Content-Length'])),
+                timeout,
+            )
+        else:
+            content = await self._wait(reader.read(), timeout)
+            keep_alive = False
+        read_time = time.perf_counter() - read_started
+        return status, reason, headers, content, read_time, keep_alive
+
+
+class UaPbInterpayPullStats(object):
+    """Per-phase timings and counters of a single pull, collected from any
+    thread that performs it. Timings of concurrent requests add up, thus
+    they may exceed duration of the pull."""
+
+    PHASES = ('cert_load', 'handshake', 'request', 'read', 'decode',
+              'normalize')
+    COUNTERS = ('requests', 'retries', 'pages', 'transactions', 'skipped',
+                'lines', 'bytes_sent', 'bytes_received')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.started = fields.Datetime.now()
+        self.timings = dict.fromkeys(self.PHASES, 0.0)
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            self.timings[phase] += seconds
+
+    def count(self, counter, value=1):
+        with self._lock:
+            self.counters[counter] += value
+
+    @contextmanager
+    def measure(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - started)
+
+    def get_record(self):
+        duration = time.perf_counter() - self._started
+        with self._lock:
+            record = dict(self.counters)
+            record.update({
+                'started': fields.Datetime.to_string(self.started),
+                'duration': round(duration, 6),
+                'timings': {
+                    phase: round(seconds, 6)
+                    for phase, seconds in self.timings.items()
+                },
+                'transactions_per_second': round(
+                    self.counters['transactions'] / duration
+                    if duration else 0.0,
+                    1,
+                ),
+            })
+        return record
+
+
+class UaPbInterpayRateLimiter(object):
+    """Token bucket shared by all providers that use the same InterPay
+    login, allows bursts of up to one second worth of requests"""
+
+    def __init__(self, rate):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+
+    @property
+    def burst(self):
+        return max(self._rate, 1.0)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._rate = rate
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self):
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return
+            time.sleep(delay)
+
+    def try_acquire(self):
+        """Takes a token and returns 0, or returns how long to wait for one"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._tokens + (now - self._updated) * self._rate,
+                self.burst,
+            )
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self._rate
+
+
+class UaPbInterpaySharedRateLimiter(UaPbInterpayRateLimiter):
+    """Same as UaPbInterpayRateLimiter, except that the bucket is a row of
+    ua.pb.interpay.rate.bucket, thus it's shared by every Odoo worker. The
+    row is locked only while a token is taken, within a transaction of its
+    own."""
+
+    def __init__(self, rate, cursor, login):
+        super().__init__(rate)
+        self._cursor = cursor
+        self._login = login
+        self._created = False
+
+    def try_acquire(self):
+        with self._lock, self._cursor() as cr:
+            if not self._created:
+                cr.execute(
+                    'INSERT INTO ua_pb_interpay_rate_bucket'
+                    ' (login, tokens, updated)'
+                    " VALUES (%s, %s, clock_timestamp() AT TIME ZONE 'UTC')"
+                    ' ON CONFLICT (login) DO NOTHING',
+                    (self._login, self.burst),
+                )
+                self._created = True
+            cr.execute(
+                "SELECT tokens, updated, clock_timestamp() AT TIME ZONE 'UTC'"
+                ' FROM ua_pb_interpay_rate_bucket'
+                ' WHERE login = %s'
+                ' FOR UPDATE',
+                (self._login,),
+            )
+            tokens, updated, now = cr.fetchone()
+            tokens = min(
+                tokens + max((now - updated).total_seconds(), 0.0)
+                * self._rate,
+                self.burst,
+            )
+            delay = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                delay = (1.0 - tokens) / self._rate
+            cr.execute(
+                'UPDATE ua_pb_interpay_rate_bucket'
+                ' SET tokens = %s, updated = %s'
+                ' WHERE login = %s',
+                (tokens, now, self._login),
+            )
+            return delay
+
+
+class UaPbInterpaySharedPages(object):
+    """Report pages retrieved during a pull of several providers, shared
+    between providers that use the same InterPay login. A page is kept only
+    for providers of the login that are yet to get it, until they do or
+    their pull is over, see release(). Pages are only read while being
+    parsed, thus every provider gets the very same page."""
+
+    def __init__(self, consumers):
+        self._lock = threading.Lock()
+        self._pages = {}
+        # NOTE: Providers per login that are yet to be pulled
+        self._consumers = {
+            credentials: set(provider_ids)
+            for credentials, provider_ids in consumers.items()
+        }
+
+    def get(self, key, consumer):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry is None or consumer not in entry[1]:
+                return None
+            data, pending = entry
+            pending.discard(consumer)
+            if not pending:
+                del self._pages[key]
+            return data
+
+    def put(self, key, data, consumer):
+        with self._lock:
+            pending = self._consumers.get(key[0], set()) - {consumer}
+            if pending:
+                self._pages[key] = [data, pending]
+
+    def release(self, consumer):
+        """Drops pages kept for the provider, once its pull is over"""
+        with self._lock:
+            for provider_ids in self._consumers.values():
+                provider_ids.discard(consumer)
+            for key, (_data, pending) in list(self._pages.items()):
+                pending.discard(consumer)
+                if not pending:
+                    del self._pages[key]
+
+
+class UaPbInterpayPrefetcher(object):
+    """Statement data of providers that are due for a scheduled pull,
+    obtained ahead by a pool of workers, a group of providers per worker.
+    Groups are submitted in order the scheduled pull gets to them, and only
+    as many of them as there are workers are held at once: next group is
+    submitted once every provider of an earlier one got its data."""
+
+    def __init__(self, prefetch, groups, workers):
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._prefetch = prefetch
+        self._workers = workers
+        self._groups = [list(provider_ids) for provider_ids in groups]
+        self._futures = {}
+        self._pending = {}
+        self._failed = set()
+        self._periods = {}
+        self._submit()
+
+    def _submit(self):
+        while self._groups and len(self._pending) < self._workers:
+            provider_ids = self._groups.pop(0)
+            future = self._executor.submit(self._prefetch, provider_ids)
+            self._pending[future] = set(provider_ids)
+            for provider_id in provider_ids:
+                self._futures[provider_id] = future
+
+    def get(self, provider_id):
+        """Returns [(date_since, date_until, data, calls, error)] of the
+        provider, that the scheduled pull pops as it gets to them. Waits for
+        the group of the provider, unless it's not submitted yet: then the
+        provider is not prefetched at all."""
+        periods = self._periods.get(provider_id)
+        if periods is not None:
+            return periods
+        periods = self._periods[provider_id] = []
+        future = self._futures.pop(provider_id, None)
+        if future is None:
+            for provider_ids in self._groups:
+                if provider_id in provider_ids:
+                    provider_ids.remove(provider_id)
+            self._groups = list(filter(None, self._groups))
+            return periods
+        try:
+            periods.extend(future.result().pop(provider_id, []))
+        except Exception:
+            # NOTE: Such providers are pulled by the scheduled pull
+            if future not in self._failed:
+                self._failed.add(future)
+                _logger.warning(
+                    'Failed to prefetch InterPay statement data',
+                    exc_info=True,
+                )
+        pending = self._pending[future]
+        pending.discard(provider_id)
+        if not pending:
+            del self._pending[future]
+            self._submit()
+        return periods
+
+    def close(self):
+        """Drops groups that were not started, and waits for the rest"""
+        self._groups = []
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown()
+
+
+class UaPbInterpayWorkerCall(object):
+    """Calls a method of records from worker threads. Neither the cursor nor
+    the cache of an environment may be used by a thread other than the one
+    that owns it, thus each call is made within an environment of its own,
+    on a new cursor that is committed once the call is done. Only plain
+    values are kept: values of fields read beforehand are put into the cache
+    of that environment, so that workers don't read them from the database,
+    which may not have them committed yet."""
+
+    def __init__(self, records, cursor, values=None):
+        self._cursor = cursor
+        self._uid = records.env.uid
+        self._context = dict(records.env.context)
+        self._model = records._name
+        self._ids = list(records.ids)
+        self._values = values or {}
+
+    def __call__(self, method, *args, **kwargs):
+        with api.Environment.manage(), self._cursor() as cr:
+            env = api.Environment(cr, self._uid, self._context)
+            records = env[self._model].browse(self._ids)
+            for record in records:
+                values = self._values.get(record.id)
+                if values:
+                    record._cache.update(record._convert_to_cache(
+                        values,
+                        validate=False,
+                    ))
+            return getattr(records, method)(*args, **kwargs)
+
+
+class UaPbInterpayTransaction(object):
+    """Transaction of InterPay report reduced to what the import needs. Date
+    is kept as milliseconds since the Unix epoch, amount is negative for
+    payments. For hooks written against raw transactions, transaction['fields']
+    gives these values under the names used by the report."""
+
+    __slots__ = (
+        'epoch',
+        'amount',
+        'ref',
+        'description',
+        'our_account',
+        'partner_account',
+        'client_name',
+        'state',
+    )
+
+    def __init__(
+            self, epoch, amount, ref, description, our_account,
+            partner_account, client_name=None, state='SUCCESS'):
+        self.epoch = epoch
+        self.amount = amount
+        self.ref = ref
+        self.description = description
+        self.our_account = our_account
+        self.partner_account = partner_account
+        self.client_name = client_name
+        self.state = state
+
+    @property
+    def date(self):
+        """Naive UTC date"""
+        return UA_PB_EPOCH + timedelta(milliseconds=self.epoch)
+
+    @property
+    def timestamp(self):
+        """Integer epoch seconds, truncated towards zero same as int() of
+        date.timestamp() is"""
+        epoch = self.epoch
+        return epoch // 1000 if epoch >= 0 else -(-epoch // 1000)
+
+    @staticmethod
+    def get_first_present(fields, keys):
+        for key in keys:
+            if key in fields:
+                return fields[key]
+        return None
+
+    @staticmethod
+    def get_first_set(fields, keys):
+        for key in keys:
+            value = fields.get(key)
+            if value:
+                return value
+        return None
+
+    def __getitem__(self, key):
+        if key != 'fields':
+            raise KeyError(key)
+        if self.amount is not None and self.amount.is_signed():
+            names = ('DATECREATE', 'AMTDEBIT', 'PAYMENTREF', 'DESCRIPTION',
+                     'EXTACC', 'ACC2600')
+        else:
+            names = ('REFILLDATE', 'REFILLAMT', 'REFILLREF', 'REFILLDESCR',
+                     'REFILLCREDACC', 'REFILLDEBACC')
+        fields = {
+            name: value
+            for name, value in zip(names, (
+                self.date if self.epoch is not None else None,
+                self.amount.copy_abs() if self.amount is not None else None,
+                self.ref,
+                self.description,
+                self.our_account,
+                self.partner_account,
+            ))
+            if value is not None
+        }
+        if self.client_name is not None:
+            fields['CLIENTFIO'] = self.client_name
+        fields['STATE'] = self.state
+        return fields
+
+    def __eq__(self, other):
+        if not isinstance(other, UaPbInterpayTransaction):
+            return NotImplemented
+        return all(map(
+            lambda slot: getattr(self, slot) == getattr(other, slot),
+            self.__slots__
+        ))
+
+    def __repr__(self):
+        return 'UaPbInterpayTransaction(%s)' % ', '.join(map(
+            lambda slot: '%s=%r' % (slot, getattr(self, slot)),
+            self.__slots__
+        ))
 
 
 class OnlineBankStatementProviderUaPbInterpay(models.Model):
     _inherit = 'online.bank.statement.provider'
 
+    ua_pb_interpay_concurrency = fields.Integer(
+        string='Concurrent Requests',
+        default=1,
+        help=(
+            'Maximum number of InterPay requests performed in parallel,'
+            ' value of 1 fetches intervals and pages one by one'
+        ),
+    )
+    ua_pb_interpay_transport = fields.Selection(
+        selection=[
+            ('threads', 'Threads'),
+            ('asyncio', 'Asyncio'),
+        ],
+        string='Transport',
+        default='threads',
+        required=True,
+        help=(
+            'How concurrent InterPay requests are performed: each by a thread'
+            ' of its own, or all of them by an event loop within the thread'
+            ' that pulls the statement'
+        ),
+    )
+
+    ua_pb_interpay_rate_limit = fields.Float(
+        string='Requests per Second',
+        help=(
+            'Maximum rate of InterPay requests, shared by all providers that'
+            ' use the same Username, the lowest rate set on any of them'
+            ' applies to all, value of 0 means no limit. The limit is kept'
+            ' in the database, thus it applies across all Odoo workers'
+        ),
+    )
+    ua_pb_interpay_checkpoint = fields.Boolean(
+        string='Resume Failed Pulls',
+        help=(
+            'Keep InterPay report pages retrieved by a pull that failed, so'
+            ' that the next pull resumes from the page that failed'
+        ),
+    )
+
+    ua_pb_interpay_streaming = fields.Boolean(
+        string='Stream Transactions',
+        help=(
+            'Fetch, parse and convert InterPay transactions to statement lines'
+            ' lazily and save lines in batches as they are converted, instead'
+            ' of collecting all lines of a statement first. Not used by'
+            ' scheduled pulls.'
+        ),
+    )
+    ua_pb_interpay_bulk_import = fields.Boolean(
+        string='Bulk Import',
+        help=(
+            'Save statement lines in batches: already imported lines, bank'
+            ' accounts and partners of counterparties are looked up for a'
+            ' whole batch at once and its lines are created together,'
+            ' instead of line by line'
+        ),
+    )
+
+    ua_pb_interpay_cache = fields.Boolean(
+        string='Cache Report Pages',
+        help=(
+            'Keep InterPay report pages of settled whole report windows in'
+            ' the database and reuse them instead of downloading them again'
+        ),
+    )
+    ua_pb_interpay_settlement_lag = fields.Integer(
+        string='Settlement Lag (days)',
+        default=3,
+        help=(
+            'Intervals that ended earlier than this number of days ago are'
+            ' considered final and served from cache'
+        ),
+    )
+
+    ua_pb_interpay_adaptive = fields.Boolean(
+        string='Adaptive Windows',
+        help=(
+            'Tune report window and page size after every pull: enlarge'
+            ' pages while InterPay accepts them, shrink windows that still'
+            ' take too many pages and grow them back up to 30 days once'
+            ' they fit'
+        ),
+    )
+    ua_pb_interpay_window_size = fields.Integer(
+        string='Window Size (days)',
+        default=UA_PB_INTERPAY_MAX_WINDOW_SIZE,
+        readonly=True,
+    )
+    ua_pb_interpay_page_size = fields.Integer(
+        string='Page Size',
+        default=UA_PB_INTERPAY_PAGE_SIZE,
+        readonly=True,
+    )
+    ua_pb_interpay_page_size_limit = fields.Integer(
+        string='Page Size Limit',
+        readonly=True,
+        help='Largest page size InterPay was seen to accept, if it capped one',
+    )
+
+    ua_pb_interpay_pull_stats = fields.Text(
+        string='Last Pull Statistics',
+        readonly=True,
+        help=(
+            'Timings of pull phases, number of requests, pages and'
+            ' transactions and bytes transferred by the last successful'
+            ' pull, JSON-encoded'
+        ),
+    )
+
+    ua_pb_interpay_cursor_overlap = fields.Integer(
+        string='Pull Overlap (minutes)',
+        default=60,
+        help=(
+            'Scheduled pulls re-request this many minutes before the last'
+            ' pulled transaction to pick up late-posted transactions'
+        ),
+    )
+    ua_pb_interpay_cursor_account = fields.Char(
+        readonly=True,
+    )
+    ua_pb_interpay_cursor_date = fields.Datetime(
+        string='Pulled Until',
+        readonly=True,
+        help='Date of the latest transaction seen by scheduled pulls',
+    )
+    ua_pb_interpay_cursor_refs = fields.Text(
+        readonly=True,
+        help='Refs of transactions seen at Pulled Until, JSON-encoded',
+    )
+
+    ua_pb_interpay_backfill_since = fields.Datetime(
+        string='Backfill Since',
+        readonly=True,
+    )
+    ua_pb_interpay_backfill_until = fields.Datetime(
+        string='Backfill Until',
+        readonly=True,
+    )
+    ua_pb_interpay_backfill_date = fields.Datetime(
+        string='Backfilled Until',
+        readonly=True,
+        help=(
+            'Statements of the backfill are pulled up to this date, the'
+            ' backfill resumes from it'
+        ),
+    )
+
+    @api.multi
+    @api.constrains('ua_pb_interpay_concurrency')
+    def _check_ua_pb_interpay_concurrency(self):
+        for provider in self:
+            concurrency = provider.ua_pb_interpay_concurrency
+            if 1 <= concurrency <= UA_PB_INTERPAY_MAX_CONCURRENCY:
+                continue
+            raise ValidationError(_(
+                'Concurrent Requests must be between 1 and %s'
+            ) % (UA_PB_INTERPAY_MAX_CONCURRENCY,))
+
+    @api.multi
+    @api.constrains('ua_pb_interpay_rate_limit')
+    def _check_ua_pb_interpay_rate_limit(self):
+        for provider in self:
+            if provider.ua_pb_interpay_rate_limit < 0:
+                raise ValidationError(_(
+                    'Requests per Second can not be negative'
+                ))
+
+    @api.multi
+    @api.constrains('ua_pb_interpay_settlement_lag')
+    def _check_ua_pb_interpay_settlement_lag(self):
+        for provider in self:
+            if provider.ua_pb_interpay_settlement_lag < 0:
+                raise ValidationError(_(
+                    'Settlement Lag can not be negative'
+                ))
+
+    @api.multi
+    @api.constrains('ua_pb_interpay_cursor_overlap')
+    def _check_ua_pb_interpay_cursor_overlap(self):
+        for provider in self:
+            if provider.ua_pb_interpay_cursor_overlap < 0:
+                raise ValidationError(_(
+                    'Pull Overlap can not be negative'
+                ))
+
     @api.model
     def _get_available_services(self):
         return super()._get_available_services() + [
             ('ua_pb_interpay', 'InterPay.PrivatBank.ua'),
         ]
 
+    @api.multi
+    def write(self, vals):
+        if UA_PB_INTERPAY_SESSION_FIELDS.intersection(vals):
+            self._ua_pb_interpay_drop_session()
+        if UA_PB_INTERPAY_SSL_CONTEXT_FIELDS.intersection(vals):
+            self._ua_pb_interpay_drop_ssl_context()
+        return super().write(vals)
+
+    @api.multi
+    def unlink(self):
+        self._ua_pb_interpay_drop_session()
+        self._ua_pb_interpay_drop_ssl_context()
+        return super().unlink()
+
+    @api.multi
+    def _pull(self, date_since, date_until):
+        if getattr(_ua_pb_interpay_pull, 'shared_pages', None) is not None:
+            return self._ua_pb_interpay_pull_providers(date_since, date_until)
+        consumers = self._ua_pb_interpay_get_consumers()
+        if not any(len(ids) > 1 for ids in consumers.values()):
+            return self._ua_pb_interpay_pull_providers(date_since, date_until)
+        _ua_pb_interpay_pull.shared_pages = UaPbInterpaySharedPages(consumers)
+        try:
+            return self._ua_pb_interpay_pull_providers(date_since, date_until)
+        finally:
+            _ua_pb_interpay_pull.shared_pages = None
+
+    @api.multi
+    def _ua_pb_interpay_get_consumers(self):
+        """Returns {credentials: provider ids} of InterPay providers, as
+        consumers of UaPbInterpaySharedPages"""
+        consumers = {}
+        for provider in self:
+            if provider.service != 'ua_pb_interpay':
+                continue
+            consumers.setdefault(
+                provider._ua_pb_interpay_get_credentials(),
+                set(),
+            ).add(provider.id)
+        return consumers
+
+    @api.multi
+    def _ua_pb_interpay_pull_providers(self, date_since, date_until):
+        """Pulls InterPay providers with Bulk Import enabled or streamed
+        lines using _ua_pb_interpay_bulk_pull(), and the rest as usual"""
+        shared_pages = getattr(_ua_pb_interpay_pull, 'shared_pages', None)
+        bulk_providers = self.filtered(
+            lambda provider: provider.service == 'ua_pb_interpay'
+            and (
+                provider.ua_pb_interpay_bulk_import
+                or provider._ua_pb_interpay_is_streaming()
+            )
+        )
+        if not bulk_providers and shared_pages is None:
+            return super(OnlineBankStatementProviderUaPbInterpay, self)._pull(
+                date_since,
+                date_until,
+            )
+        for provider in self:
+            try:
+                if provider in bulk_providers:
+                    provider._ua_pb_interpay_bulk_pull(date_since, date_until)
+                    continue
+                super(OnlineBankStatementProviderUaPbInterpay, provider)._pull(
+                    date_since,
+                    date_until,
+                )
+            finally:
+                if shared_pages is not None:
+                    shared_pages.release(provider.id)
+
+    @api.multi
+    def _ua_pb_interpay_bulk_pull(self, date_since, date_until):
+        """Pulls the provider with _pull() of the base module, which still
+        walks statement periods, reports failures of scheduled pulls, writes
+        statement values and schedules next run. Only saving of lines
+        differs: _obtain_statement_data() hands them to
+        _ua_pb_interpay_import_statement_data() instead of returning them."""
+        self.ensure_one()
+        return super(
+            OnlineBankStatementProviderUaPbInterpay,
+            self.with_context(ua_pb_interpay_bulk_pull=True),
+        )._pull(date_since, date_until)
+
+    @api.multi
+    def _ua_pb_interpay_import_statement_data(
+            self, data, date_since, date_until):
+        """Saves lines of the period to its statement, found or created the
+        same way _pull() does, by _ua_pb_interpay_import_lines() as they are
+        read. Counterparties are matched only with Bulk Import enabled.
+        Returns statement values left for _pull() to write, with balances
+        adjusted by lines out of the period."""
+        self.ensure_one()
+        lines, statement_values = data or ([], {})
+        lines = lines or []
+        statement_values = statement_values or {}
+        if not lines and not statement_values \
+                and not self.allow_empty_statements:
+            return data
+        statement = self._ua_pb_interpay_get_statement(
+            self._get_statement_date(date_since, date_until),
+            statement_values,
+        )
+        self._ua_pb_interpay_import_lines(
+            statement,
+            lines,
+            statement_values,
+            date_since,
+            date_until,
+            match_partners=self.ua_pb_interpay_bulk_import,
+        )
+        return [], statement_values
+
+    @api.multi
+    def _ua_pb_interpay_get_statement(self, statement_date, statement_values):
+        """Returns open statement of the date, same as _pull() does, created
+        with statement_values if there's none"""
+        self.ensure_one()
+        AccountBankStatement = self.env['account.bank.statement']
+        if self.env.context.get('scheduled'):
+            AccountBankStatement = AccountBankStatement.with_context(
+                tracking_disable=True,
+            )
+        statement = AccountBankStatement.search([
+            ('journal_id', '=', self.journal_id.id),
+            ('state', '=', 'open'),
+            ('date', '=', statement_date),
+        ], limit=1)
+        if not statement:
+            statement_values.update({
+                'name': self.journal_id.sequence_id.with_context(
+                    ir_sequence_date=statement_date,
+                ).next_by_id(),
+                'journal_id': self.journal_id.id,
+                'date': statement_date,
+            })
+            statement = AccountBankStatement.with_context(
+                journal_id=self.journal_id.id,
+            ).create(
+                # NOTE: This is needed since create() alters values
+                statement_values.copy()
+            )
+        return statement
+
+    @api.multi
+    def _ua_pb_interpay_import_lines(
+            self, statement, lines, statement_values, date_since,
+            date_until, match_partners=True):
+        """Creates lines of the statement that are within the period and
+        not imported yet, UA_PB_INTERPAY_BULK_SIZE lines at a time, each
+        batch with a single create() call. Amounts of lines out of the
+        period are applied to balances in statement_values instead. Returns
+        number of lines created."""
+        self.ensure_one()
+        count = 0
+        AccountBankStatementLine = \
+            self.env['account.bank.statement.line'].with_context(
+                statement.env.context,
+            )
+        provider_tz = timezone(self.tz) if self.tz else utc
+        lines = iter(lines)
+        for chunk in iter(
+                lambda: list(itertools.islice(
+                    lines,
+                    UA_PB_INTERPAY_BULK_SIZE,
+                )),
+                []):
+            batch = []
+            for line_values in chunk:
+                date = line_values['date']
+                if not isinstance(date, datetime):
+                    date = fields.Datetime.from_string(date)
+                if date.tzinfo is not None:
+                    date = date.astimezone(utc).replace(tzinfo=None)
+                if date < date_since:
+                    if 'balance_start' in statement_values:
+                        statement_values['balance_start'] = Decimal(
+                            statement_values['balance_start']
+                        ) + Decimal(line_values['amount'])
+                    continue
+                elif date >= date_until:
+                    if 'balance_end_real' in statement_values:
+                        statement_values['balance_end_real'] = Decimal(
+                            statement_values['balance_end_real']
+                        ) - Decimal(line_values['amount'])
+                    continue
+                line_values['date'] = utc.localize(date).astimezone(
+                    provider_tz
+                ).replace(tzinfo=None)
+                bank_account_number = line_values.get('account_number')
+                if bank_account_number:
+                    line_values['account_number'] = \
+                        self._sanitize_bank_account_number(
+                            bank_account_number
+                        )
+                batch.append(line_values)
+
+            imported_ids = self._ua_pb_interpay_get_imported_ids(set(
+                line_values['unique_import_id']
+                for line_values in batch
+                if line_values.get('unique_import_id')
+            ))
+            if imported_ids:
+                batch = [
+                    line_values
+                    for line_values in batch
+                    if line_values.get('unique_import_id') not in imported_ids
+                ]
+            if not batch:
+                continue
+            for line_values in batch:
+                unique_import_id = line_values.get('unique_import_id')
+                if unique_import_id:
+                    line_values['unique_import_id'] = \
+                        self._generate_unique_import_id(unique_import_id)
+                line_values['statement_id'] = statement.id
+            if match_partners:
+                self._ua_pb_interpay_match_partners(batch)
+            AccountBankStatementLine.create(batch)
+            count += len(batch)
+        return count
+
+    @api.multi
+    def _ua_pb_interpay_match_partners(self, lines):
+        """Sets bank account and partner of lines that have none, found by
+        account number of the counterparty or, failing that, by its name if
+        exactly one partner of the company (or shared) has it. Names are
+        looked up for all lines at once, account numbers by
+        _ua_pb_interpay_get_counterparties()."""
+        self.ensure_one()
+        lines = [
+            line_values
+            for line_values in lines
+            if not line_values.get('bank_account_id')
+            and not line_values.get('partner_id')
+        ]
+        bank_accounts = self._ua_pb_interpay_get_counterparties(set(
+            line_values['account_number']
+            for line_values in lines
+            if line_values.get('account_number')
+        ))
+        partners = {}
+        partner_names = set(
+            line_values['partner_name']
+            for line_values in lines
+            if line_values.get('partner_name')
+            and not bank_accounts.get(line_values.get('account_number'))
+        )
+        if partner_names:
+            for partner in self.env['res.partner'].search([
+                    ('name', 'in', list(partner_names)),
+                    ('parent_id', '=', False),
+                    ('company_id', 'in', [self.company_id.id, False]),
+                    ]):
+                partners[partner.name] = \
+                    partner.id if partner.name not in partners else False
+        for line_values in lines:
+            bank_account = bank_accounts.get(line_values.get('account_number'))
+            if bank_account:
+                line_values.update({
+                    'bank_account_id': bank_account[0],
+                    'partner_id': bank_account[1],
+                })
+            elif partners.get(line_values.get('partner_name')):
+                line_values['partner_id'] = \
+                    partners[line_values['partner_name']]
+
+    @api.multi
+    def _ua_pb_interpay_get_counterparties(self, account_numbers):
+        """Returns {account number: (bank account id, partner id)} of bank
+        accounts that sanitized account numbers of counterparties belong to,
+        all looked up at once. Bank account of the company is preferred over
+        one shared by all companies."""
+        # NOTE: Sanitized number is stored and indexed by res.partner.bank
+        # itself, thus no index is kept aside to be invalidated
+        self.ensure_one()
+        counterparties = {}
+        if not account_numbers:
+            return counterparties
+        for bank_account in self.env['res.partner.bank'].search([
+                ('sanitized_acc_number', 'in', list(account_numbers)),
+                ('company_id', 'in', [self.company_id.id, False]),
+                ], order='id'):
+            account_number = bank_account.sanitized_acc_number
+            if account_number in counterparties \
+                    and not bank_account.company_id:
+                continue
+            counterparties[account_number] = (
+                bank_account.id,
+                bank_account.partner_id.id,
+            )
+        return counterparties
+
+    @api.model
+    def _scheduled_pull(self):
+        # NOTE: Providers are pulled one by one, each releasing pages that
+        # were kept for it once done
+        if getattr(_ua_pb_interpay_pull, 'shared_pages', None) is not None:
+            return super()._scheduled_pull()
+        providers = self._ua_pb_interpay_get_scheduled_providers()
+        _ua_pb_interpay_pull.shared_pages = UaPbInterpaySharedPages(
+            providers._ua_pb_interpay_get_consumers()
+        )
+        try:
+            _ua_pb_interpay_pull.prefetcher = \
+                providers._ua_pb_interpay_get_prefetcher()
+            return super()._scheduled_pull()
+        finally:
+            if _ua_pb_interpay_pull.prefetcher is not None:
+                _ua_pb_interpay_pull.prefetcher.close()
+            _ua_pb_interpay_pull.shared_pages = None
+            _ua_pb_interpay_pull.prefetcher = None
+
+    @api.multi
+    def _ua_pb_interpay_get_prefetcher(self):
+        """Returns UaPbInterpayPrefetcher that obtains statement data of the
+        providers in a pool of workers, each with a cursor of its own, or
+        None if there's nothing to run in parallel. Providers that use the
+        same login are pulled by the same worker one by one. Statements are
+        then written by the scheduled pull itself, see
+        _ua_pb_interpay_pop_prefetched()."""
+        groups = []
+        group_indexes = {}
+        for provider in self:
+            credentials = provider._ua_pb_interpay_get_credentials()
+            if credentials not in group_indexes:
+                group_indexes[credentials] = len(groups)
+                groups.append([])
+            groups[group_indexes[credentials]].append(provider.id)
+        if len(groups) < 2:
+            return None
+        call = UaPbInterpayWorkerCall(
+            self.browse(),
+            self._ua_pb_interpay_get_worker_cursor_factory(),
+        )
+        return UaPbInterpayPrefetcher(
+            lambda provider_ids: call(
+                '_ua_pb_interpay_prefetch_providers',
+                provider_ids,
+            ),
+            groups,
+            min(len(groups), UA_PB_INTERPAY_SCHEDULER_WORKERS),
+        )
+
+    @api.model
+    def _ua_pb_interpay_get_scheduled_providers(self):
+        """Returns InterPay providers that are due for a scheduled pull"""
+        return self.search([
+            ('active', '=', True),
+            ('next_run', '<=', fields.Datetime.now()),
+            ('service', '=', 'ua_pb_interpay'),
+        ])
+
+    @api.model
+    def _ua_pb_interpay_prefetch_providers(self, provider_ids):
+        # NOTE: Runs in a worker, within an environment of its own, see
+        # UaPbInterpayWorkerCall
+        prefetched = {}
+        providers = self.browse(provider_ids)
+        shared_pages = UaPbInterpaySharedPages(
+            providers._ua_pb_interpay_get_consumers()
+        )
+        _ua_pb_interpay_pull.shared_pages = shared_pages
+        _ua_pb_interpay_pull.deferred_calls = {}
+        try:
+            for provider in providers.with_context({'scheduled': True}):
+                try:
+                    prefetched[provider.id] = \
+                        provider._ua_pb_interpay_prefetch_statement_data()
+                finally:
+                    shared_pages.release(provider.id)
+        finally:
+            _ua_pb_interpay_pull.shared_pages = None
+            _ua_pb_interpay_pull.deferred_calls = None
+        return prefetched
+
+    @api.model
+    def _ua_pb_interpay_get_worker_cursor_factory(self):
+        """Returns a function that opens a new cursor for a worker, see
+        UaPbInterpayWorkerCall. Unlike the function, this is called by the
+        thread that starts workers."""
+        return self.pool.cursor
+
+    @api.multi
+    def _ua_pb_interpay_prefetch_statement_data(self):
+        """Returns [(date_since, date_until, data, calls, error)] of every
+        statement the scheduled pull would obtain, up to the first one that
+        failed, along with calls deferred meanwhile"""
+        self.ensure_one()
+        date_since = self.last_successful_run or (
+            self.next_run - self._get_next_run_period()
+        )
+        date_until = self.next_run
+        deferred_calls = _ua_pb_interpay_pull.deferred_calls
+        periods = []
+        statement_date_since = self._get_statement_date_since(date_since)
+        while statement_date_since < date_until:
+            statement_date_until = (
+                statement_date_since + self._get_statement_date_step()
+            )
+            data = None
+            error = None
+            try:
+                data = self._obtain_statement_data(
+                    statement_date_since,
+                    statement_date_until,
+                )
+            except Exception as e:
+                error = e
+            periods.append((
+                statement_date_since,
+                statement_date_until,
+                data,
+                deferred_calls.pop(self.id, []),
+                error,
+            ))
+            if error is not None:
+                break
+            statement_date_since = statement_date_until
+        return periods
+
+    @api.multi
+    def _ua_pb_interpay_pop_prefetched(self, date_since, date_until):
+        """Returns statement data prefetched for the period, if any, after
+        making calls that were deferred while obtaining it"""
+        self.ensure_one()
+        prefetcher = getattr(_ua_pb_interpay_pull, 'prefetcher', None)
+        periods = prefetcher.get(self.id) if prefetcher else None
+        if not periods or periods[0][0:2] != (date_since, date_until):
+            return None
+        _date_since, _date_until, data, calls, error = periods.pop(0)
+        for method, args in calls:
+            getattr(self, method)(*args)
+        if error is not None:
+            raise error
+        return data
+
+    @api.multi
+    def _ua_pb_interpay_write_state(self, values):
+        """Writes pull state of the provider. While prefetching, values are
+        only cached until the scheduled pull writes them."""
+        self.ensure_one()
+        if self._ua_pb_interpay_defer('write', values):
+            self._cache.update(self._convert_to_cache(values, validate=False))
+
+    @api.multi
+    def _ua_pb_interpay_defer(self, method, *args):
+        """Calls the method of the provider, except in prefetch workers:
+        these may not write anything, since their cursors are not part of the
+        transaction of the scheduled pull, thus the call is handed over to
+        the scheduled pull, see _ua_pb_interpay_pop_prefetched(). Returns
+        whether the call was deferred."""
+        self.ensure_one()
+        deferred_calls = getattr(_ua_pb_interpay_pull, 'deferred_calls', None)
+        if deferred_calls is None:
+            getattr(self, method)(*args)
+            return False
+        deferred_calls.setdefault(self.id, []).append((method, args))
+        return True
+
+    @api.multi
+    def _ua_pb_interpay_start_backfill(self, date_since, date_until):
+        """Schedules pull of the period to be run in background, one
+        window after another, see _ua_pb_interpay_run_backfills()"""
+        for provider in self:
+            provider.write({
+                'ua_pb_interpay_backfill_since': date_since,
+                'ua_pb_interpay_backfill_until': date_until,
+                'ua_pb_interpay_backfill_date':
+                    provider._get_statement_date_since(date_since),
+            })
+
+    @api.model
+    def _ua_pb_interpay_run_backfills(self):
+        """Pulls windows of pending backfills, each committed on its own
+        along with progress of the backfill, until time is up. Backfills
+        that were interrupted or failed resume on the next run."""
+        started = time.monotonic()
+        providers = self.with_context(active_test=False).search([
+            ('service', '=', 'ua_pb_interpay'),
+            ('ua_pb_interpay_backfill_date', '!=', False),
+        ])
+        for provider in providers:
+            while provider.ua_pb_interpay_backfill_date \
+                    < provider.ua_pb_interpay_backfill_until:
+                if time.monotonic() - started \
+                        >= UA_PB_INTERPAY_BACKFILL_DURATION:
+                    return
+                if not provider._ua_pb_interpay_run_backfill_window():
+                    break
+
+    @api.multi
+    def _ua_pb_interpay_run_backfill_window(self):
+        """Pulls next window of the backfill and commits it. Returns False
+        if the window failed, it's retried by the next run then."""
+        self.ensure_one()
+        date_since = self.ua_pb_interpay_backfill_date
+        date_until = self._ua_pb_interpay_get_backfill_window_end(date_since)
+        try:
+            with self.env.cr.savepoint():
+                self._pull(date_since, date_until)
+                self.write({
+                    'ua_pb_interpay_backfill_date': date_until,
+                })
+        except Exception as e:
+            self.env.clear()
+            _logger.warning(
+                'Online Bank Statement Provider "%s" failed to backfill'
+                ' statements since %s until %s',
+                self.name,
+                date_since,
+                date_until,
+                exc_info=True,
+            )
+            self.message_post(
+                body=_(
+                    'Failed to backfill statements since %s until %s: %s.'
+                    ' Backfill will be resumed from %s.'
+                ) % (
+                    date_since,
+                    date_until,
+                    escape(str(e)) or _('N/A'),
+                    date_since,
+                ),
+                subject=_('Issue with Online Bank Statement Provider'),
+            )
+            self._ua_pb_interpay_commit()
+            return False
+        self._ua_pb_interpay_commit()
+        return True
+
+    @api.multi
+    def _ua_pb_interpay_get_backfill_window_end(self, date_since):
+        """Returns end of the backfill window that starts at date_since:
+        as many whole statements as fit in a report window, yet at least one,
+        and none beyond the end of the backfill"""
+        self.ensure_one()
+        window_end = date_since + timedelta(
+            days=self._ua_pb_interpay_get_window_size(),
+        )
+        date_until = date_since + self._get_statement_date_step()
+        while date_until < self.ua_pb_interpay_backfill_until:
+            next_date_until = date_until + self._get_statement_date_step()
+            if next_date_until > window_end:
+                break
+            date_until = next_date_until
+        return min(date_until, self.ua_pb_interpay_backfill_until)
+
+    @api.model
+    def _ua_pb_interpay_commit(self):
+        # NOTE: Tests run in a single transaction that is rolled back
+        if getattr(threading.currentThread(), 'testing', False):
+            return
+        self.env.cr.commit()
+
+    @api.multi
+    def action_ua_pb_interpay_import_export(self):
+        self.ensure_one()
+        return {
+            'name': _('Import InterPay Export'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'ua.pb.interpay.export.import.wizard',
+            'views': [[False, 'form']],
+            'target': 'new',
+            'context': {
+                'default_provider_id': self.id,
+            },
+        }
+
+    @api.multi
+    def _ua_pb_interpay_import_export(
+            self, file, file_format='json', date_since=None,
+            date_until=None):
+        """Imports transactions of an InterPay export, read from a binary
+        file, to statements of the journal, UA_PB_INTERPAY_BULK_SIZE
+        transactions at a time. Transactions are converted to lines same as
+        pulled ones and saved by _ua_pb_interpay_import_lines(), thus memory
+        use does not depend on size of the file. Returns (number of
+        transactions, number of lines created)."""
+        self.ensure_one()
+        if not self.account_number:
+            raise UserError(_(
+                'Bank Account not linked or Account Number not set'
+            ))
+        if file_format == 'csv':
+            transactions = self._ua_pb_interpay_read_csv_export(file)
+        else:
+            transactions = self._ua_pb_interpay_read_json_export(file)
+        date_since = date_since or datetime.min
+        date_until = date_until or datetime.max
+        statements = {}
+        transactions_count = 0
+        lines_count = 0
+        for chunk in iter(
+                lambda: list(itertools.islice(
+                    transactions,
+                    UA_PB_INTERPAY_BULK_SIZE,
+                )),
+                []):
+            transactions_count += len(chunk)
+            entries = self._ua_pb_interpay_get_page_entries(
+                {'list': chunk},
+                date_since,
+                date_until,
+            )
+            entries.sort(key=attrgetter('epoch'))
+            periods = {}
+            for line in self._ua_pb_interpay_transactions_to_lines(entries):
+                periods.setdefault(
+                    self._get_statement_date_since(line['date']),
+                    [],
+                ).append(line)
+            for statement_date_since, lines in periods.items():
+                statement_date_until = (
+                    statement_date_since + self._get_statement_date_step()
+                )
+                if statement_date_since not in statements:
+                    statements[statement_date_since] = \
+                        self._ua_pb_interpay_get_statement(
+                            self._get_statement_date(
+                                statement_date_since,
+                                statement_date_until,
+                            ),
+                            {},
+                        )
+                lines_count += self._ua_pb_interpay_import_lines(
+                    statements[statement_date_since],
+                    lines,
+                    {},
+                    statement_date_since,
+                    statement_date_until,
+                )
+        _logger.info(
+            'InterPay export imported to "%s": %d transactions, %d lines'
+            ' in %d statements',
+            self.name,
+            transactions_count,
+            lines_count,
+            len(statements),
+        )
+        return transactions_count, lines_count
+
+    @api.model
+    def _ua_pb_interpay_read_json_export(self, file):
+        """Yields transactions of a JSON export: either a report, same as
+        /payment/report returns, or a list of its transactions. The file is
+        read UA_PB_INTERPAY_EXPORT_CHUNK_SIZE characters at a time and
+        transactions are decoded one by one as they're complete."""
+        decoder = json.JSONDecoder(parse_float=Decimal)
+        text = TextIOWrapper(file, encoding='utf-8-sig')
+        try:
+            buffer = ''
+            position = 0
+            eof = False
+            started = False
+            while True:
+                if not started:
+                    # NOTE: Transactions are either the document itself or
+                    # its "list", that may follow other keys
+                    stripped = buffer.lstrip()
+                    if stripped.startswith('['):
+                        position = len(buffer) - len(stripped) + 1
+                        started = True
+                        continue
+                    match = re.search(r'"list"\s*:\s*\[', buffer)
+                    if match:
+                        position = match.end()
+                        started = True
+                        continue
+                else:
+                    while position < len(buffer) \
+                            and buffer[position] in ' \t\r\n,':
+                        position += 1
+                    if position < len(buffer):
+                        if buffer[position] == ']':
+                            return
+                        try:
+                            transaction, position = decoder.raw_decode(
+                                buffer,
+                                position,
+                            )
+                        except ValueError:
+                            if eof:
+                                raise
+                        else:
+                            yield transaction
+                            continue
+                if eof:
+                    raise UserError(_(
+                        'InterPay export has no list of transactions'
+                    ))
+                buffer = buffer[position:]
+                position = 0
+                chunk = text.read(UA_PB_INTERPAY_EXPORT_CHUNK_SIZE)
+                eof = not chunk
+                buffer += chunk
+        finally:
+            # NOTE: Wrapper closes the file once collected unless detached
+            text.detach()
+
+    @api.model
+    def _ua_pb_interpay_read_csv_export(self, file):
+        """Yields transactions of a CSV export, that has names of InterPay
+        fields as a header, one row at a time"""
+        text = TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            header = text.readline()
+            dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+            for row in csv.DictReader(
+                    itertools.chain([header], text),
+                    dialect=dialect):
+                yield {
+                    'fields': self._ua_pb_interpay_parse_export_row(row),
+                }
+        finally:
+            # NOTE: Wrapper closes the file once collected unless detached
+            text.detach()
+
+    @api.model
+    def _ua_pb_interpay_parse_export_row(self, row):
+        """Returns fields of a transaction from a row of CSV export, with
+        empty ones omitted and timestamps as numbers, same as the API
+        returns them"""
+        fields = {}
+        for field, value in row.items():
+            if not field or not value or not value.strip():
+                continue
+            field = field.strip()
+            value = value.strip()
+            if field in UA_PB_INTERPAY_TIMESTAMP_FIELDS:
+                if not value.isdigit():
+                    raise UserError(_(
+                        'InterPay export has "%s" as %s, milliseconds are'
+                        ' expected'
+                    ) % (value, field))
+                value = int(value)
+            fields[field] = value
+        return fields
+
+    @api.multi
+    def _ua_pb_interpay_get_credentials(self):
+        self.ensure_one()
+        return self.api_base or UA_PB_INTERPAY_API_BASE, self.username
+
     @api.multi
     def _obtain_statement_data(self, date_since, date_until):
         self.ensure_one()
@@ -44,6 +1774,25 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
                 date_until,
             )  # pragma: no cover
 
+        data = self._ua_pb_interpay_obtain_statement_data(
+            date_since,
+            date_until,
+        )
+        if self.env.context.get('ua_pb_interpay_bulk_pull'):
+            return self._ua_pb_interpay_import_statement_data(
+                data,
+                date_since,
+                date_until,
+            )
+        return data
+
+    @api.multi
+    def _ua_pb_interpay_obtain_statement_data(self, date_since, date_until):
+        self.ensure_one()
+        data = self._ua_pb_interpay_pop_prefetched(date_since, date_until)
+        if data is not None:
+            return data
+
         if not self.account_number:
             raise UserError(_('Bank Account not linked or Account Number not set'))
 
@@ -52,38 +1801,397 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
         if date_until.tzinfo:
             date_until = date_until.astimezone(utc).replace(tzinfo=None)
 
-        balance_start, balance_end = self._ua_pb_interpal_get_balance(
-            date_since,
-            date_until,
-        )
+        stats = self._ua_pb_interpay_begin_pull_stats()
+        try:
+            lines, statement_values = \
+                self._ua_pb_interpay_pull_statement_data(
+                    date_since,
+                    date_until,
+                )
+        except Exception as e:
+            self._ua_pb_interpay_end_pull_stats(
+                stats,
+                date_since,
+                date_until,
+                error=e,
+            )
+            raise
+        if not isinstance(lines, list):
+            return self._ua_pb_interpay_track_lines(
+                lines,
+                stats,
+                date_since,
+                date_until,
+            ), statement_values
+        stats.count('lines', len(lines))
+        self._ua_pb_interpay_end_pull_stats(stats, date_since, date_until)
+        return lines, statement_values
 
-        transactions = self._ua_pb_interpal_get_transactions(
-            date_since,
-            date_until,
-        )
-        if not transactions:
+    @api.multi
+    def _ua_pb_interpay_is_streaming(self):
+        self.ensure_one()
+        # NOTE: Scheduled pulls have to fail within _obtain_statement_data to
+        # be reported per provider, thus lines are not streamed there
+        return self.ua_pb_interpay_streaming \
+            and not self.env.context.get('scheduled')
+
+    @api.multi
+    def _ua_pb_interpay_pull_statement_data(self, date_since, date_until):
+        self.ensure_one()
+
+        if self._ua_pb_interpay_is_streaming():
+            return self._ua_pb_interpay_stream_statement_data(
+                date_since,
+                date_until,
+            )
+
+        # NOTE: Scheduled pulls request only transactions after the last seen
+        # one, less the overlap. Such report does not start at date_since,
+        # thus its opening balance is probed separately.
+        cursor = None
+        report_since = date_since
+        if self.env.context.get('scheduled'):
+            cursor = self._ua_pb_interpay_get_cursor()
+        if cursor:
+            report_since = max(date_since, min(
+                cursor[0] - timedelta(
+                    minutes=self.ua_pb_interpay_cursor_overlap,
+                ),
+                date_until,
+            ))
+        entries, balance_start, balance_end = \
+            self._ua_pb_interpay_pull_report(
+                report_since,
+                date_until,
+            )
+        if report_since != date_since:
+            balance_start = None
+        if cursor:
+            entries = self._ua_pb_interpay_filter_seen_entries(
+                entries,
+                cursor,
+            )
+        if self.env.context.get('scheduled'):
+            self._ua_pb_interpay_advance_cursor(entries, cursor)
+        entries = self._ua_pb_interpay_drop_imported(entries)
+        # NOTE: Probe balances separately only if report pages had none
+        if balance_start is None:
+            balance_start = self._ua_pb_interpay_get_balance_start(
+                date_since,
+                date_until,
+            )
+        if balance_end is None:
+            balance_end = self._ua_pb_interpay_get_balance_end(
+                date_since,
+                date_until,
+            )
+        if not entries:
             return [], {
                 'balance_start': balance_start,
                 'balance_end_real': balance_end,
             }
 
-        # Normalize transactions, sort by date, and get lines
-        transactions = list(sorted(
-            transactions,
-            key=lambda transaction: self._ua_pb_interpay_get_transaction_date(
-                transaction
-            )
-        ))
-        lines = list(itertools.chain.from_iterable(map(
-            lambda x: self._ua_pb_interpay_transaction_to_lines(x),
-            transactions
-        )))
+        # Sort normalized transactions by date and get lines
+        entries.sort(key=attrgetter('epoch'))
+        with self._ua_pb_interpay_get_pull_stats().measure('normalize'):
+            lines = list(self._ua_pb_interpay_transactions_to_lines(entries))
 
         return lines, {
             'balance_start': balance_start,
             'balance_end_real': balance_end,
         }
 
+    @api.multi
+    def _ua_pb_interpay_track_lines(
+            self, lines, stats, date_since, date_until):
+        """Pass streamed lines through, the pull ends with the stream"""
+        self.ensure_one()
+        count = 0
+        try:
+            for line in lines:
+                count += 1
+                yield line
+        except Exception as e:
+            stats.count('lines', count)
+            self._ua_pb_interpay_end_pull_stats(
+                stats,
+                date_since,
+                date_until,
+                error=e,
+            )
+            raise
+        stats.count('lines', count)
+        self._ua_pb_interpay_end_pull_stats(stats, date_since, date_until)
+
+    @api.multi
+    def _ua_pb_interpay_begin_pull_stats(self):
+        self.ensure_one()
+        stats = UaPbInterpayPullStats()
+        _ua_pb_interpay_pull_stats[(self.env.cr.dbname, self.id)] = stats
+        return stats
+
+    @api.multi
+    def _ua_pb_interpay_get_pull_stats(self):
+        """Returns statistics of the pull in progress, requests made outside
+        of a pull are counted into a throwaway one"""
+        self.ensure_one()
+        stats = _ua_pb_interpay_pull_stats.get((self.env.cr.dbname, self.id))
+        if stats is None:
+            stats = UaPbInterpayPullStats()
+        return stats
+
+    @api.multi
+    def _ua_pb_interpay_end_pull_stats(
+            self, stats, date_since, date_until, error=None):
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        if _ua_pb_interpay_pull_stats.get(key) is stats:
+            del _ua_pb_interpay_pull_stats[key]
+        record = stats.get_record()
+        record.update({
+            'date_since': fields.Datetime.to_string(date_since),
+            'date_until': fields.Datetime.to_string(date_until),
+        })
+        _logger.info(
+            'InterPay pull of "%s" since %s until %s %s in %.3f s:'
+            ' %d requests (%d retries), %d pages, %d transactions'
+            ' (%.1f per second), %d already imported, %d lines, %d bytes'
+            ' sent, %d bytes received; %s',
+            self.name,
+            record['date_since'],
+            record['date_until'],
+            'failed' if error is not None else 'done',
+            record['duration'],
+            record['requests'],
+            record['retries'],
+            record['pages'],
+            record['transactions'],
+            record['transactions_per_second'],
+            record['skipped'],
+            record['lines'],
+            record['bytes_sent'],
+            record['bytes_received'],
+            ', '.join(
+                '%s %.3f s' % (phase, record['timings'][phase])
+                for phase in UaPbInterpayPullStats.PHASES
+            ),
+        )
+        # NOTE: Failed pull might have left the transaction unusable
+        if error is None:
+            self._ua_pb_interpay_write_state({
+                'ua_pb_interpay_pull_stats': json.dumps(record),
+            })
+        return record
+
+    @api.multi
+    def _ua_pb_interpay_stream_statement_data(self, date_since, date_until):
+        self.ensure_one()
+
+        # NOTE: First page of the last interval is fetched ahead to know the
+        # closing balance, it's reused once the stream gets to it
+        intervals = self._ua_pb_interpay_get_intervals(date_since, date_until)
+        first_pages = {}
+        balance_start = None
+        balance_end = None
+        if intervals:
+            for interval_start, interval_end in {intervals[0], intervals[-1]}:
+                data = None
+                if self.ua_pb_interpay_cache:
+                    data = self._ua_pb_interpay_get_cached_report_page(
+                        interval_start,
+                        interval_end,
+                        0,
+                    )
+                if data is None:
+                    data = self._ua_pb_interpay_get_report_page(
+                        interval_start,
+                        interval_end,
+                        0,
+                    )
+                first_pages[interval_start] = data
+            turnover = self._ua_pb_interpay_get_turnover(
+                first_pages[intervals[0][0]]
+            )
+            if turnover:
+                balance_start = turnover['startBalance']
+            turnover = self._ua_pb_interpay_get_turnover(
+                first_pages[intervals[-1][0]]
+            )
+            if turnover:
+                balance_end = turnover['endBalance']
+        if balance_start is None:
+            balance_start = self._ua_pb_interpay_get_balance_start(
+                date_since,
+                date_until,
+            )
+        if balance_end is None:
+            balance_end = self._ua_pb_interpay_get_balance_end(
+                date_since,
+                date_until,
+            )
+
+        return self._ua_pb_interpay_stream_lines(
+            date_since,
+            date_until,
+            first_pages,
+        ), {
+            'balance_start': balance_start,
+            'balance_end_real': balance_end,
+        }
+
+    @api.multi
+    def _ua_pb_interpay_stream_lines(self, since, until, first_pages=None):
+        """Yield lines ordered by date, holding in memory only transactions
+        of the interval that no lines are made of yet"""
+        self.ensure_one()
+        get_transaction_epoch = attrgetter('epoch')
+
+        def get_page_entries(interval_start, interval_end, data):
+            entries = self._ua_pb_interpay_drop_imported(
+                self._ua_pb_interpay_get_page_entries(
+                    data,
+                    interval_start,
+                    interval_end,
+                )
+            )
+            entries.sort(key=get_transaction_epoch)
+            return entries
+
+        def drain(entries):
+            # NOTE: Popped from the end, so that each transaction is released
+            # once merged, rather than with the whole page
+            entries.reverse()
+            while entries:
+                yield entries.pop()
+
+        pages = self._ua_pb_interpay_get_report_pages(
+            since,
+            until,
+            first_pages,
+        )
+        # NOTE: Intervals do not overlap, so only pages of the same interval
+        # have to be merged
+        for interval, interval_pages in itertools.groupby(
+                pages, key=lambda page: page[0:2]):
+            yield from self._ua_pb_interpay_transactions_to_lines(
+                heapq.merge(
+                    *[
+                        drain(get_page_entries(*page))
+                        for page in interval_pages
+                    ],
+                    key=get_transaction_epoch
+                )
+            )
+
+    @api.multi
+    def _ua_pb_interpay_drop_imported(self, entries):
+        """Drops transactions that were imported to the journal already.
+        Unlike the import, that checks lines one by one once they're made,
+        all of them are looked up at once beforehand."""
+        self.ensure_one()
+        if not entries:
+            return entries
+        if self._ua_pb_interpay_has_transaction_hooks():
+            import_ids = [
+                '%s-%s' % (
+                    self._ua_pb_interpay_get_transaction_ref(entry),
+                    int(
+                        self._ua_pb_interpay_get_transaction_date(entry)
+                        .timestamp()
+                    ),
+                )
+                for entry in entries
+            ]
+        else:
+            # NOTE: Transactions left for hooks to make lines of, see
+            # _ua_pb_interpay_transactions_to_lines(), are never dropped
+            import_ids = [
+                '%s-%s' % (entry.ref, entry.timestamp)
+                if type(entry.epoch) is int and entry.ref is not None
+                else None
+                for entry in entries
+            ]
+        imported_ids = self._ua_pb_interpay_get_imported_ids(
+            set(import_ids) - {None}
+        )
+        if not imported_ids:
+            return entries
+        self._ua_pb_interpay_get_pull_stats().count(
+            'skipped',
+            sum(map(lambda import_id: import_id in imported_ids, import_ids)),
+        )
+        return [
+            entry
+            for entry, import_id in zip(entries, import_ids)
+            if import_id not in imported_ids
+        ]
+
+    @api.multi
+    def _ua_pb_interpay_get_imported_ids(self, import_ids):
+        """Returns which of unique_import_id values of lines are imported to
+        the journal already, looked up by the index of the column"""
+        self.ensure_one()
+        # NOTE: Lines are imported with unique_import_id prefixed by account
+        # number and journal, see _generate_unique_import_id()
+        prefix = self._generate_unique_import_id('')
+        imported_ids = set()
+        for chunk in self.env.cr.split_for_in_conditions(
+                [prefix + import_id for import_id in import_ids]):
+            self.env.cr.execute(
+                'SELECT unique_import_id FROM account_bank_statement_line'
+                ' WHERE unique_import_id IN %s',
+                (chunk,)
+            )
+            imported_ids.update(map(
+                lambda row: row[0][len(prefix):],
+                self.env.cr.fetchall()
+            ))
+        return imported_ids
+
+    @api.multi
+    def _ua_pb_interpay_get_cursor(self):
+        """Returns (date, refs) of the latest transaction(s) seen by scheduled
+        pulls of current account, if any"""
+        self.ensure_one()
+        if not self.ua_pb_interpay_cursor_date \
+                or self.ua_pb_interpay_cursor_account != self.account_number:
+            return None
+        return (
+            self.ua_pb_interpay_cursor_date,
+            set(json.loads(self.ua_pb_interpay_cursor_refs or '[]')),
+        )
+
+    @api.multi
+    def _ua_pb_interpay_filter_seen_entries(self, entries, cursor):
+        self.ensure_one()
+        cursor_date, cursor_refs = cursor
+        return list(filter(
+            lambda entry: entry.date.replace(microsecond=0) != cursor_date
+            or entry.ref not in cursor_refs,
+            entries
+        ))
+
+    @api.multi
+    def _ua_pb_interpay_advance_cursor(self, entries, cursor=None):
+        self.ensure_one()
+        cursor_date, cursor_refs = cursor or (None, set())
+        cursor_refs = set(cursor_refs)
+        for entry in entries:
+            date = entry.date.replace(microsecond=0)
+            if cursor_date is not None and date < cursor_date:
+                continue
+            if date != cursor_date:
+                cursor_date = date
+                cursor_refs = set()
+            cursor_refs.add(entry.ref)
+        if cursor_date is None or cursor == (cursor_date, cursor_refs):
+            return
+        self._ua_pb_interpay_write_state({
+            'ua_pb_interpay_cursor_account': self.account_number,
+            'ua_pb_interpay_cursor_date': cursor_date,
+            'ua_pb_interpay_cursor_refs': json.dumps(sorted(cursor_refs)),
+        })
+
     @api.model
     def _ua_pb_interpay_string(self, value):
         # NOTE: Decodes unicode entities (\uXXXX) as well
@@ -91,7 +2199,7 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
 
     @api.model
     def _ua_pb_interpay_decimal(self, value):
-        if isinstance(value, float):
+        if isinstance(value, (float, int)):
             return Decimal(value)
         elif isinstance(value, Decimal):
             return value
@@ -105,20 +2213,44 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
 
     @api.model
     def _ua_pb_interpay_preparse_transaction(self, transaction):
+        """Returns UaPbInterpayTransaction of a transaction of the report"""
+        if isinstance(transaction, UaPbInterpayTransaction):
+            return transaction
         fields = transaction['fields']
-        if 'DATECREATE' in fields:
-            fields['DATECREATE'] = (UA_PB_TIMESTAMP_BASE + timedelta(
-                milliseconds=fields['DATECREATE'],
-            )).astimezone(utc).replace(tzinfo=None)
-        if 'REFILLDATE' in fields:
-            fields['REFILLDATE'] = (UA_PB_TIMESTAMP_BASE + timedelta(
-                milliseconds=fields['REFILLDATE'],
-            )).astimezone(utc).replace(tzinfo=None)
-        return transaction
+        get_first_present = UaPbInterpayTransaction.get_first_present
+        get_first_set = UaPbInterpayTransaction.get_first_set
+
+        # NOTE: CSV reports use DATECREATE, as well as filtering
+        timestamp = get_first_present(fields, UA_PB_INTERPAY_DATE_FIELDS)
+        if timestamp is not None:
+            timestamp = self._ua_pb_interpay_timestamp_to_epoch(timestamp)
+        amount = fields.get(UA_PB_INTERPAY_DEBIT_AMOUNT_FIELD)
+        is_debit = amount is not None
+        if not is_debit:
+            amount = fields.get(UA_PB_INTERPAY_CREDIT_AMOUNT_FIELD)
+        if amount is not None:
+            amount = self._ua_pb_interpay_decimal(amount).copy_abs()
+            if is_debit:
+                amount = amount.copy_negate()
+        return UaPbInterpayTransaction(
+            timestamp,
+            amount,
+            get_first_set(fields, UA_PB_INTERPAY_REF_FIELDS),
+            get_first_set(fields, UA_PB_INTERPAY_DESCRIPTION_FIELDS),
+            get_first_present(fields, UA_PB_INTERPAY_OUR_ACCOUNT_FIELDS),
+            get_first_present(fields, UA_PB_INTERPAY_PARTNER_ACCOUNT_FIELDS),
+            fields.get('CLIENTFIO'),
+            fields.get('STATE', 'SUCCESS'),
+        )
+
+    @api.model
+    def _ua_pb_interpay_timestamp_to_epoch(self, timestamp):
+        """Returns milliseconds since the Unix epoch of InterPay timestamp"""
+        return timestamp - UA_PB_TIMESTAMP_OFFSET
 
     @api.model
     def _ua_pb_interpay_transaction_to_lines(self, transaction):
-        fields = transaction['fields']
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
         name = self._ua_pb_interpay_get_transaction_description(transaction)
         amount = self._ua_pb_interpay_get_transaction_amount(transaction)
         date = self._ua_pb_interpay_get_transaction_date(transaction)
@@ -136,10 +2268,10 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
             'date': date,
             'unique_import_id': unique_import_id,
         }
-        if 'CLIENTFIO' in fields:
+        if transaction.client_name is not None:
             line.update({
                 'partner_name': self._ua_pb_interpay_string(
-                    fields['CLIENTFIO']
+                    transaction.client_name
                 ),
             })
         if partner_account:
@@ -149,98 +2281,1011 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
         return [line]
 
     @api.multi
-    def _ua_pb_interpal_get_balance(self, since, until):
+    def _ua_pb_interpal_get_balance(self, since, until):
+        self.ensure_one()
+        return (
+            self._ua_pb_interpay_get_balance_start(since, until),
+            self._ua_pb_interpay_get_balance_end(since, until),
+        )
+
+    @api.multi
+    def _ua_pb_interpay_get_balance_start(self, since, until):
+        self.ensure_one()
+        data = self._ua_pb_interpay_retrieve('/payment/report', {
+            'from': int(since.timestamp()) * 1000,
+            'to': int(min(since + relativedelta(days=1), until).timestamp())
+            * 1000,
+            'pagination': {
+                'page': 0,
+                'per': 1,
+            },
+        })
+        turnover = self._ua_pb_interpay_get_turnover(data)
+        return turnover['startBalance'] if turnover else None
+
+    @api.multi
+    def _ua_pb_interpay_get_balance_end(self, since, until):
+        self.ensure_one()
+        data = self._ua_pb_interpay_retrieve('/payment/report', {
+            'from': int(max(until - relativedelta(days=1), since).timestamp())
+            * 1000,
+            'to': int(until.timestamp()) * 1000,
+            'pagination': {
+                'page': 0,
+                'per': 1,
+            },
+        })
+        turnover = self._ua_pb_interpay_get_turnover(data)
+        return turnover['endBalance'] if turnover else None
+
+    @api.multi
+    def _ua_pb_interpay_get_turnover(self, data):
+        self.ensure_one()
+        return next(filter(
+            lambda turnover: self._sanitize_bank_account_number(
+                turnover['acc']
+            ) == self.account_number,
+            data.get('accountTurnovers', [])
+        ), None)
+
+    @api.multi
+    def _ua_pb_interpal_get_transactions(self, since, until):
+        self.ensure_one()
+        transactions = []
+        pages = self._ua_pb_interpay_get_report_pages(since, until)
+        for interval_start, interval_end, data in pages:
+            transactions += self._ua_pb_interpay_get_page_transactions(
+                data,
+                interval_start,
+                interval_end,
+            )
+        return transactions
+
+    @api.multi
+    def _ua_pb_interpay_pull_report(self, since, until):
+        """Returns normalized transactions, see
+        _ua_pb_interpay_get_page_entries(), along with opening balance of the
+        first interval and closing balance of the last interval, if
+        reported"""
+        self.ensure_one()
+        entries = []
+        turnovers = []
+        pages = self._ua_pb_interpay_get_report_pages(since, until)
+        for interval_start, interval_end, data in pages:
+            # NOTE: Every interval starts with its first page
+            if not turnovers or turnovers[-1][0] != interval_start:
+                turnovers.append((
+                    interval_start,
+                    self._ua_pb_interpay_get_turnover(data),
+                ))
+            entries += self._ua_pb_interpay_get_page_entries(
+                data,
+                interval_start,
+                interval_end,
+            )
+
+        balance_start = None
+        balance_end = None
+        if turnovers and turnovers[0][1]:
+            balance_start = turnovers[0][1]['startBalance']
+        if turnovers and turnovers[-1][1]:
+            balance_end = turnovers[-1][1]['endBalance']
+        return entries, balance_start, balance_end
+
+    @api.multi
+    def _ua_pb_interpay_get_page_entries(
+            self, data, interval_start, interval_end):
+        """Returns UaPbInterpayTransaction of each transaction of the page
+        that belongs to the account and the interval, in order of the page.
+        Lines are made of them once sorted, see
+        _ua_pb_interpay_transactions_to_lines()."""
+        self.ensure_one()
+        stats = self._ua_pb_interpay_get_pull_stats()
+        stats.count('pages')
+        stats.count('transactions', len(data['list']))
+        with stats.measure('normalize'):
+            if self._ua_pb_interpay_has_transaction_hooks():
+                return self._ua_pb_interpay_get_page_transactions(
+                    data,
+                    interval_start,
+                    interval_end,
+                )
+            return self._ua_pb_interpay_normalize_page(
+                data,
+                interval_start,
+                interval_end,
+            )
+
+    @api.multi
+    def _ua_pb_interpay_has_transaction_hooks(self):
+        self.ensure_one()
+        model_class = type(self)
+        return any(map(
+            lambda hook: getattr(model_class, hook) is not getattr(
+                OnlineBankStatementProviderUaPbInterpay,
+                hook,
+            ),
+            UA_PB_INTERPAY_TRANSACTION_HOOKS
+        ))
+
+    @api.multi
+    def _ua_pb_interpay_transactions_to_lines(self, transactions):
+        """Yields lines of each transaction, same as
+        _ua_pb_interpay_transaction_to_lines() does, yet without calling
+        hooks per field of a transaction unless any of them is overridden"""
+        self.ensure_one()
+        if self._ua_pb_interpay_has_transaction_hooks():
+            for transaction in transactions:
+                yield from self._ua_pb_interpay_transaction_to_lines(
+                    transaction
+                )
+            return
+        for transaction in transactions:
+            epoch = transaction.epoch
+            if type(epoch) is not int or transaction.amount is None \
+                    or transaction.ref is None \
+                    or transaction.description is None \
+                    or transaction.partner_account is None:
+                # NOTE: Let hooks either make lines or report what's missing
+                yield from self._ua_pb_interpay_transaction_to_lines(
+                    transaction
+                )
+                continue
+            line = {
+                'name': transaction.description,
+                'amount': str(transaction.amount),
+                'date': UA_PB_EPOCH + timedelta(milliseconds=epoch),
+                'unique_import_id': '%s-%s' % (
+                    transaction.ref,
+                    transaction.timestamp,
+                ),
+            }
+            if transaction.client_name is not None:
+                line['partner_name'] = transaction.client_name
+            if transaction.partner_account:
+                line['account_number'] = transaction.partner_account
+            yield line
+
+    @api.multi
+    def _ua_pb_interpay_normalize_page(
+            self, data, interval_start, interval_end):
+        """Same as _ua_pb_interpay_get_page_transactions(), yet in a single
+        pass over the page without calling hooks per field of each
+        transaction"""
+        self.ensure_one()
+        account_number = self.account_number
+        our_account_numbers = {}
+        entries = []
+        # NOTE: Transactions are matched against the interval by epoch in
+        # microseconds. Integer epoch seconds of lines are the same as
+        # int(date.timestamp()) gives, since Odoo runs with TZ=UTC.
+        microsecond = timedelta(microseconds=1)
+        interval_start_us = (interval_start - UA_PB_EPOCH) // microsecond
+        interval_end_us = (interval_end - UA_PB_EPOCH) // microsecond
+        get_first_present = UaPbInterpayTransaction.get_first_present
+        get_first_set = UaPbInterpayTransaction.get_first_set
+
+        for transaction in data['list']:
+            fields = transaction['fields']
+
+            if fields.get('STATE', 'SUCCESS') != 'SUCCESS':
+                continue
+
+            timestamp = get_first_present(fields, UA_PB_INTERPAY_DATE_FIELDS)
+            our_account_number = get_first_present(
+                fields,
+                UA_PB_INTERPAY_OUR_ACCOUNT_FIELDS,
+            )
+            description = get_first_set(
+                fields,
+                UA_PB_INTERPAY_DESCRIPTION_FIELDS,
+            )
+            ref = get_first_set(fields, UA_PB_INTERPAY_REF_FIELDS)
+            partner_account = get_first_present(
+                fields,
+                UA_PB_INTERPAY_PARTNER_ACCOUNT_FIELDS,
+            )
+            amount = fields.get(UA_PB_INTERPAY_DEBIT_AMOUNT_FIELD)
+            is_debit = amount is not None
+            if not is_debit:
+                amount = fields.get(UA_PB_INTERPAY_CREDIT_AMOUNT_FIELD)
+            if type(timestamp) is not int or our_account_number is None \
+                    or description is None or ref is None \
+                    or partner_account is None or amount is None:
+                # NOTE: Let hooks either skip it or report what's missing
+                entries += self._ua_pb_interpay_get_page_transactions(
+                    {'list': [transaction]},
+                    interval_start,
+                    interval_end,
+                )
+                continue
+
+            epoch_ms = timestamp - UA_PB_TIMESTAMP_OFFSET
+            epoch_us = epoch_ms * 1000
+            if epoch_us >= interval_end_us or epoch_us < interval_start_us:
+                continue
+
+            if our_account_number not in our_account_numbers:
+                our_account_numbers[our_account_number] = \
+                    self._sanitize_bank_account_number(our_account_number)
+            if our_account_numbers[our_account_number] != account_number:
+                continue
+
+            if not isinstance(amount, Decimal):
+                amount = self._ua_pb_interpay_decimal(amount)
+            amount = amount.copy_abs()
+            if is_debit:
+                amount = amount.copy_negate()
+
+            entries.append(UaPbInterpayTransaction(
+                epoch_ms,
+                amount,
+                ref,
+                description,
+                our_account_number,
+                partner_account,
+                fields.get('CLIENTFIO'),
+            ))
+        return entries
+
+    @api.multi
+    def _ua_pb_interpay_get_page_transactions(
+            self, data, interval_start, interval_end):
+        self.ensure_one()
+        interval_transactions = map(
+            lambda transaction:
+            self._ua_pb_interpay_preparse_transaction(
+                transaction
+            ),
+            data['list']
+        )
+        return list(filter(
+            lambda t: self._ua_pb_interpay_filter_transaction(
+                t,
+                interval_start,
+                interval_end
+            ),
+            interval_transactions
+        ))
+
+    @api.multi
+    def _ua_pb_interpay_get_intervals(self, since, until):
+        """Split the period by report windows, only the first and the last
+        intervals may be part of a window"""
+        self.ensure_one()
+        assert since.tzinfo is None
+        interval_start = since
+        assert until.tzinfo is None
+        intervals = []
+        while interval_start < until:
+            interval_end = min(
+                self._ua_pb_interpay_get_window_end(interval_start),
+                until,
+            )
+            intervals.append((interval_start, interval_end))
+            interval_start = interval_end
+        return intervals
+
+    @api.multi
+    def _ua_pb_interpay_get_window_end(self, date):
+        """Returns end of the report window that contains date. Windows are
+        whole days of Kiev time counted from the epoch, so that pulls of
+        overlapping periods request same windows and reuse them from cache"""
+        self.ensure_one()
+        # NOTE: Not more than 30 days in a row
+        window_size = self._ua_pb_interpay_get_window_size()
+        window_date = date \
+            .replace(tzinfo=utc) \
+            .astimezone(UA_PB_TIMEZONE) \
+            .date()
+        window_date += timedelta(
+            days=window_size
+            - (window_date - UA_PB_EPOCH.date()).days % window_size,
+        )
+        # NOTE: Kiev switches DST at night, thus midnight is never ambiguous
+        return UA_PB_TIMEZONE.localize(
+            datetime.combine(window_date, datetime.min.time()),
+        ).astimezone(utc).replace(tzinfo=None)
+
+    @api.multi
+    def _ua_pb_interpay_get_report_pages(
+            self, since, until, first_pages=None):
+        """Yield (interval_start, interval_end, data) of every report page,
+        ordered by interval and page regardless of concurrency. First pages
+        that were already retrieved can be passed keyed by interval start."""
+        self.ensure_one()
+        # NOTE: start_date <= date <= end_date, thus check every transaction
+        intervals = self._ua_pb_interpay_get_intervals(since, until)
+        if first_pages is None:
+            first_pages = {}
+        if not self.ua_pb_interpay_cache \
+                and not self.ua_pb_interpay_checkpoint:
+            pages = self._ua_pb_interpay_get_remote_report_pages(
+                intervals,
+                first_pages,
+            )
+        else:
+            pages = self._ua_pb_interpay_get_cached_report_pages(
+                intervals,
+                first_pages,
+            )
+        if self.ua_pb_interpay_adaptive:
+            pages = self._ua_pb_interpay_tune_report_pages(pages)
+        return pages
+
+    @api.multi
+    def _ua_pb_interpay_get_window_size(self):
+        self.ensure_one()
+        if not self.ua_pb_interpay_adaptive:
+            return UA_PB_INTERPAY_MAX_WINDOW_SIZE
+        return max(1, min(
+            self.ua_pb_interpay_window_size,
+            UA_PB_INTERPAY_MAX_WINDOW_SIZE,
+        ))
+
+    @api.multi
+    def _ua_pb_interpay_get_page_size(self):
+        self.ensure_one()
+        if not self.ua_pb_interpay_adaptive:
+            return UA_PB_INTERPAY_PAGE_SIZE
+        return max(1, min(
+            self.ua_pb_interpay_page_size,
+            UA_PB_INTERPAY_MAX_PAGE_SIZE,
+        ))
+
+    @api.multi
+    def _ua_pb_interpay_tune_report_pages(self, pages):
+        """Pass report pages through, then tune window and page size for the
+        next pull based on how many pages and transactions windows had"""
+        self.ensure_one()
+        per = self._ua_pb_interpay_get_page_size()
+        server_per = per
+        windows = []
+        previous_interval_start = None
+        for interval_start, interval_end, data in pages:
+            if interval_start != previous_interval_start:
+                previous_interval_start = interval_start
+                windows.append([0, 0])
+            windows[-1][0] += 1
+            windows[-1][1] += len(data['list'])
+            server_per = min(
+                server_per,
+                data['pagination'].get('per') or server_per,
+            )
+            yield interval_start, interval_end, data
+        if not windows:
+            return
+
+        # NOTE: Larger pages save round trips, while shorter windows only
+        # bound number of pages per window, so windows shrink only once pages
+        # can not grow anymore
+        window_size = self._ua_pb_interpay_get_window_size()
+        page_size_limit = self.ua_pb_interpay_page_size_limit
+        max_page_size = min(
+            page_size_limit or UA_PB_INTERPAY_MAX_PAGE_SIZE,
+            UA_PB_INTERPAY_MAX_PAGE_SIZE,
+        )
+        max_window_pages = max(pages for pages, _items in windows)
+        max_window_items = max(items for _pages, items in windows)
+        page_size = per
+        if server_per < per:
+            page_size = page_size_limit = server_per
+        elif max_window_pages > 1 and page_size < max_page_size:
+            page_size = min(page_size * 2, max_page_size)
+        elif max_window_pages > UA_PB_INTERPAY_MAX_WINDOW_PAGES:
+            window_size = max(window_size // 2, 1)
+        if max_window_items * 2 <= page_size \
+                * UA_PB_INTERPAY_MAX_WINDOW_PAGES:
+            window_size = min(window_size * 2, UA_PB_INTERPAY_MAX_WINDOW_SIZE)
+
+        values = {}
+        if window_size != self.ua_pb_interpay_window_size:
+            values['ua_pb_interpay_window_size'] = window_size
+        if page_size != self.ua_pb_interpay_page_size:
+            values['ua_pb_interpay_page_size'] = page_size
+        if page_size_limit != self.ua_pb_interpay_page_size_limit:
+            values['ua_pb_interpay_page_size_limit'] = page_size_limit
+        if values:
+            self._ua_pb_interpay_write_state(values)
+
+    @api.multi
+    def _ua_pb_interpay_get_remote_report_pages(
+            self, intervals, first_pages, resumed_pages=None):
+        """Retrieve report pages of intervals, except for leading pages of
+        an interval that were retrieved by a failed pull (resumed_pages)"""
+        self.ensure_one()
+        if resumed_pages is None:
+            resumed_pages = {}
+        if self.ua_pb_interpay_transport == 'asyncio' and intervals \
+                and self._ua_pb_interpay_can_run_event_loop():
+            return self._ua_pb_interpay_get_report_pages_asynchronously(
+                intervals,
+                first_pages,
+                resumed_pages,
+            )
+        if self.ua_pb_interpay_concurrency > 1 and intervals:
+            return self._ua_pb_interpay_get_report_pages_concurrently(
+                intervals,
+                first_pages,
+                resumed_pages,
+            )
+        return self._ua_pb_interpay_get_report_pages_sequentially(
+            intervals,
+            first_pages,
+            resumed_pages,
+        )
+
+    @api.multi
+    def _ua_pb_interpay_get_cached_report_pages(self, intervals, first_pages):
+        """Serve intervals that were fully stored before from cache, resume
+        intervals stored partially by a failed pull, retrieve and store the
+        rest"""
+        self.ensure_one()
+        self._ua_pb_interpay_defer('_ua_pb_interpay_drop_stale_pages')
+        cached_intervals = {}
+        resumed_pages = {}
+        for interval_start, interval_pages in \
+                self._ua_pb_interpay_find_cached_intervals(intervals).items():
+            total = max(interval_pages[0].total, 1)
+            if len(interval_pages) == total:
+                cached_intervals[interval_start] = interval_pages
+            else:
+                resumed_pages[interval_start] = [
+                    self._ua_pb_interpay_load_report_page(page.content)
+                    for page in interval_pages
+                ]
+        remote_pages = self._ua_pb_interpay_store_report_pages(
+            self._ua_pb_interpay_get_remote_report_pages(
+                [
+                    interval
+                    for interval in intervals
+                    if interval[0] not in cached_intervals
+                ],
+                first_pages,
+                resumed_pages,
+            ),
+            resumed_pages,
+        )
+        remote_intervals = itertools.groupby(
+            remote_pages,
+            key=lambda page: page[0:2]
+        )
+        for interval_start, interval_end in intervals:
+            cached_pages = cached_intervals.get(interval_start)
+            if cached_pages is None:
+                yield from next(remote_intervals)[1]
+                continue
+            for cached_page in cached_pages:
+                yield interval_start, interval_end, \
+                    self._ua_pb_interpay_load_report_page(
+                        cached_page.content,
+                    )
+        if self.ua_pb_interpay_checkpoint:
+            self._ua_pb_interpay_defer(
+                '_ua_pb_interpay_drop_checkpoints',
+                intervals,
+            )
+
+    @api.multi
+    def _ua_pb_interpay_find_cached_intervals(self, intervals):
+        """Returns stored pages of intervals keyed by interval start, only
+        leading pages without gaps, that might be not all pages"""
+        self.ensure_one()
+        UaPbInterpayReportPage = self.env['ua.pb.interpay.report.page'].sudo()
+        intervals = {
+            interval_start.replace(microsecond=0):
+            (interval_start, interval_end.replace(microsecond=0))
+            for interval_start, interval_end in intervals
+        }
+        domain = [
+            ('provider_id', '=', self.id),
+            ('account_number', '=', self.account_number),
+            ('date_from', 'in', list(intervals.keys())),
+            ('per', '=', self._ua_pb_interpay_get_page_size()),
+        ]
+        # NOTE: Checkpoints of unsettled intervals are reused only shortly
+        # after the pull that failed, as the bank may still amend them
+        if self.ua_pb_interpay_checkpoint:
+            domain += [
+                '|',
+                ('finalized', '=', True),
+                (
+                    'write_date',
+                    '>=',
+                    fields.Datetime.now() - UA_PB_INTERPAY_CHECKPOINT_TTL,
+                ),
+            ]
+        else:
+            domain += [
+                ('finalized', '=', True),
+            ]
+        cached_pages = UaPbInterpayReportPage.search(domain)
+        cached_intervals = {}
+        for date_from, interval_pages in itertools.groupby(
+                cached_pages, key=lambda page: page.date_from):
+            interval_start, date_to = intervals[date_from]
+            interval_pages = UaPbInterpayReportPage.concat(*filter(
+                lambda page: page.date_to == date_to,
+                interval_pages
+            ))
+            # NOTE: Interval might be stored partially
+            pages = interval_pages.mapped('page')
+            leading_pages = 0
+            while leading_pages < len(pages) \
+                    and pages[leading_pages] == leading_pages:
+                leading_pages += 1
+            if not leading_pages:
+                continue
+            if not self.ua_pb_interpay_checkpoint \
+                    and leading_pages < max(interval_pages[0].total, 1):
+                continue
+            cached_intervals[interval_start] = interval_pages[0:leading_pages]
+        return cached_intervals
+
+    @api.multi
+    def _ua_pb_interpay_drop_checkpoints(self, intervals):
+        """Drop pages of intervals that were stored only to resume a failed
+        pull, once the pull got all pages"""
+        self.ensure_one()
+        domain = [
+            ('provider_id', '=', self.id),
+            ('account_number', '=', self.account_number),
+            ('date_from', 'in', [
+                interval_start.replace(microsecond=0)
+                for interval_start, _interval_end in intervals
+            ]),
+        ]
+        if self.ua_pb_interpay_cache:
+            domain += [
+                ('finalized', '=', False),
+            ]
+        self.env['ua.pb.interpay.report.page'].sudo().search(domain).unlink()
+
+    @api.multi
+    def _ua_pb_interpay_drop_stale_pages(self):
+        """Drop pages of unsettled intervals that no pull can reuse: all of
+        them, unless checkpoints are kept, then only expired ones"""
+        self.ensure_one()
+        domain = [
+            ('provider_id', '=', self.id),
+            ('finalized', '=', False),
+        ]
+        if self.ua_pb_interpay_checkpoint:
+            domain += [
+                (
+                    'write_date',
+                    '<',
+                    fields.Datetime.now() - UA_PB_INTERPAY_CHECKPOINT_TTL,
+                ),
+            ]
+        self.env['ua.pb.interpay.report.page'].sudo().search(domain).unlink()
+
+    @api.multi
+    def _ua_pb_interpay_is_full_window(self, interval_start, interval_end):
+        """Whether the interval is a whole report window, as pages of
+        partial intervals are keyed by dates that differ from pull to pull"""
         self.ensure_one()
+        return interval_end == self._ua_pb_interpay_get_window_end(
+            interval_start,
+        ) and interval_start == self._ua_pb_interpay_get_window_end(
+            interval_start - timedelta(microseconds=1),
+        )
 
-        one_day = relativedelta(days=1)
+    @api.multi
+    def _ua_pb_interpay_get_cached_report_page(
+            self, interval_start, interval_end, page):
+        self.ensure_one()
+        cached_page = self.env['ua.pb.interpay.report.page'].sudo().search([
+            ('provider_id', '=', self.id),
+            ('account_number', '=', self.account_number),
+            ('date_from', '=', interval_start.replace(microsecond=0)),
+            ('date_to', '=', interval_end.replace(microsecond=0)),
+            ('page', '=', page),
+            ('per', '=', self._ua_pb_interpay_get_page_size()),
+            ('finalized', '=', True),
+        ], limit=1)
+        if not cached_page:
+            return None
+        return self._ua_pb_interpay_load_report_page(cached_page.content)
 
-        data = self._ua_pb_interpay_retrieve('/payment/report', {
-            'from': int(since.timestamp()) * 1000,
-            'to': int(min(since + one_day, until).timestamp()) * 1000,
-            'pagination': {
-                'page': 0,
-                'per': 1,
-            },
-        })
-        balance_start = next(filter(
-            lambda turnover: turnover['acc'] == self.account_number,
-            data['accountTurnovers']
-        ))['startBalance']
+    @api.multi
+    def _ua_pb_interpay_store_report_pages(self, pages, resumed_pages=None):
+        self.ensure_one()
+        if resumed_pages is None:
+            resumed_pages = {}
+        settled_until = fields.Datetime.now() - timedelta(
+            days=self.ua_pb_interpay_settlement_lag,
+        )
+        per = self._ua_pb_interpay_get_page_size()
+        page = 0
+        previous_interval_start = None
+        for interval_start, interval_end, data in pages:
+            if interval_start != previous_interval_start:
+                previous_interval_start = interval_start
+                page = 0
+            finalized = interval_end <= settled_until \
+                and self._ua_pb_interpay_is_full_window(
+                    interval_start,
+                    interval_end,
+                )
+            # NOTE: Pages that can not be reused are kept only as checkpoints
+            if page < len(resumed_pages.get(interval_start, ())) \
+                    or not finalized and not self.ua_pb_interpay_checkpoint:
+                yield interval_start, interval_end, data
+                page += 1
+                continue
+            values = {
+                'provider_id': self.id,
+                'account_number': self.account_number,
+                'date_from': interval_start.replace(microsecond=0),
+                'date_to': interval_end.replace(microsecond=0),
+                'page': page,
+                'per': per,
+                'total': data['pagination'].get('total', 1),
+                'content': self._ua_pb_interpay_dump_report_page(data),
+                'finalized': finalized,
+            }
+            self._ua_pb_interpay_defer(
+                '_ua_pb_interpay_save_report_page',
+                values,
+            )
+            yield interval_start, interval_end, data
+            page += 1
 
-        data = self._ua_pb_interpay_retrieve('/payment/report', {
-            'from': int(max(until - one_day, since).timestamp()) * 1000,
-            'to': int(until.timestamp()) * 1000,
-            'pagination': {
-                'page': 0,
-                'per': 1,
-            },
-        })
-        balance_end = next(filter(
-            lambda turnover: turnover['acc'] == self.account_number,
-            data['accountTurnovers']
-        ))['endBalance']
+    @api.multi
+    def _ua_pb_interpay_save_report_page(self, values):
+        self.ensure_one()
+        UaPbInterpayReportPage = self.env['ua.pb.interpay.report.page'].sudo()
+        cached_page = UaPbInterpayReportPage.search([
+            (field, '=', values[field])
+            for field in [
+                'provider_id',
+                'account_number',
+                'date_from',
+                'date_to',
+                'page',
+                'per',
+            ]
+        ], limit=1)
+        if cached_page:
+            cached_page.write(values)
+        else:
+            UaPbInterpayReportPage.create(values)
+
+    @api.model
+    def _ua_pb_interpay_dump_report_page(self, data):
+        def default(value):
+            if isinstance(value, Decimal):
+                return {'__decimal__': str(value)}
+            raise TypeError('%r is not JSON serializable' % (value,))
+        return json.dumps(data, default=default)
 
-        return balance_start, balance_end
+    @api.model
+    def _ua_pb_interpay_load_report_page(self, content):
+        def object_hook(value):
+            if len(value) == 1 and '__decimal__' in value:
+                return Decimal(value['__decimal__'])
+            return value
+        return json.loads(content, object_hook=object_hook)
 
     @api.multi
-    def _ua_pb_interpal_get_transactions(self, since, until):
+    def _ua_pb_interpay_get_report_pages_sequentially(
+            self, intervals, first_pages, resumed_pages):
         self.ensure_one()
-        # NOTE: Not more than 30 days in a row
-        # NOTE: start_date <= date <= end_date, thus check every transaction
-        interval_step = relativedelta(days=30)
-        assert since.tzinfo is None
-        interval_start = since
-        assert until.tzinfo is None
-        transactions = []
-        while interval_start < until:
-            interval_end = min(interval_start + interval_step, until)
-            request_interval_start = interval_start \
-                .replace(tzinfo=utc) \
-                .astimezone(UA_PB_TIMEZONE) \
-                .replace(tzinfo=None)
-            request_interval_end = interval_end \
-                .replace(tzinfo=utc) \
-                .astimezone(UA_PB_TIMEZONE) \
-                .replace(tzinfo=None)
+        for interval_start, interval_end in intervals:
+            interval_resumed_pages = resumed_pages.get(interval_start, [])
             page = 0
             total_pages = None
             while total_pages is None or page < total_pages:
-                data = self._ua_pb_interpay_retrieve('/payment/report', {
-                    'from': int(request_interval_start.timestamp()) * 1000,
-                    'to': int(request_interval_end.timestamp()) * 1000,
-                    'pagination': {
-                        'page': page,
-                        'per': 1000,
-                    },
-                })
-                interval_transactions = map(
-                    lambda transaction:
-                    self._ua_pb_interpay_preparse_transaction(
-                        transaction
-                    ),
-                    data['list']
-                )
-                transactions += list(filter(
-                    lambda t: self._ua_pb_interpay_filter_transaction(
-                        t,
+                data = None
+                if page < len(interval_resumed_pages):
+                    data = interval_resumed_pages[page]
+                    first_pages.pop(interval_start, None)
+                elif page == 0:
+                    data = first_pages.pop(interval_start, None)
+                if data is None:
+                    data = self._ua_pb_interpay_get_report_page(
                         interval_start,
-                        interval_end
-                    ),
-                    interval_transactions
-                ))
-                transactions += interval_transactions
+                        interval_end,
+                        page,
+                    )
+                yield interval_start, interval_end, data
                 total_pages = data['pagination'].get('total', 1)
                 page += 1
-            interval_start += interval_step
-        return transactions
+
+    @api.multi
+    def _ua_pb_interpay_get_report_pages_concurrently(
+            self, intervals, first_pages, resumed_pages):
+        self.ensure_one()
+        self._ua_pb_interpay_get_session()
+        shared_pages = getattr(_ua_pb_interpay_pull, 'shared_pages', None)
+        per = self._ua_pb_interpay_get_page_size()
+        # NOTE: Workers use an environment of their own, which is given
+        # everything that is read while performing a request
+        call = UaPbInterpayWorkerCall(
+            self,
+            self._ua_pb_interpay_get_worker_cursor_factory(),
+            {
+                self.id: {
+                    field: self[field]
+                    for field in UA_PB_INTERPAY_SESSION_FIELDS
+                },
+            },
+        )
+
+        def get_report_page(interval_start, interval_end, page):
+            return call(
+                '_ua_pb_interpay_get_report_page',
+                interval_start,
+                interval_end,
+                page,
+                per,
+                shared_pages=shared_pages,
+            )
+
+        with ThreadPoolExecutor(
+            max_workers=self.ua_pb_interpay_concurrency,
+        ) as executor:
+            def get_resumed_page(data):
+                future = Future()
+                future.set_result(data)
+                return future
+
+            def get_interval_pages(interval_start, interval_end, data,
+                                   interval_resumed_pages):
+                if interval_resumed_pages:
+                    data = interval_resumed_pages[0]
+                if data is None:
+                    data = get_report_page(interval_start, interval_end, 0)
+                total_pages = data['pagination'].get('total', 1)
+                return data, [
+                    get_resumed_page(interval_resumed_pages[page])
+                    if page < len(interval_resumed_pages)
+                    else executor.submit(
+                        get_report_page,
+                        interval_start,
+                        interval_end,
+                        page,
+                    )
+                    for page in range(1, total_pages)
+                ]
+
+            futures = [
+                executor.submit(
+                    get_interval_pages,
+                    interval_start,
+                    interval_end,
+                    first_pages.pop(interval_start, None),
+                    resumed_pages.get(interval_start, []),
+                )
+                for interval_start, interval_end in intervals
+            ]
+            try:
+                for (interval_start, interval_end), future in zip(
+                        intervals, futures):
+                    data, page_futures = future.result()
+                    yield interval_start, interval_end, data
+                    for page_future in page_futures:
+                        yield interval_start, interval_end, \
+                            page_future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    @api.model
+    def _ua_pb_interpay_can_run_event_loop(self):
+        # NOTE: Event loops can not be nested, thus fall back to threads if
+        # the pull itself is run by one
+        return asyncio._get_running_loop() is None
+
+    @api.multi
+    def _ua_pb_interpay_get_report_pages_asynchronously(
+            self, intervals, first_pages, resumed_pages):
+        """Same as _ua_pb_interpay_get_report_pages_concurrently(), except
+        that requests are performed by an event loop within current thread,
+        which runs while the next page is awaited"""
+        self.ensure_one()
+        shared_pages = getattr(_ua_pb_interpay_pull, 'shared_pages', None)
+        per = self._ua_pb_interpay_get_page_size()
+        session = self._ua_pb_interpay_get_session()
+        rate_limiter = self._ua_pb_interpay_get_rate_limiter()
+        loop = asyncio.new_event_loop()
+
+        async def open_session():
+            # NOTE: Created within the loop to be bound to it
+            return UaPbInterpayAsyncSession(
+                session,
+                concurrency=self.ua_pb_interpay_concurrency or 1,
+                rate_limiter=rate_limiter,
+            )
+
+        def get_resumed_page(data):
+            future = loop.create_future()
+            future.set_result(data)
+            return future
+
+        def get_page(interval_start, interval_end, page):
+            return loop.create_task(
+                self._ua_pb_interpay_get_report_page_async(
+                    async_session,
+                    interval_start,
+                    interval_end,
+                    page,
+                    per,
+                    shared_pages=shared_pages,
+                )
+            )
+
+        async def get_interval_pages(
+                interval_start, interval_end, data, interval_resumed_pages):
+            if interval_resumed_pages:
+                data = interval_resumed_pages[0]
+            if data is None:
+                data = await self._ua_pb_interpay_get_report_page_async(
+                    async_session,
+                    interval_start,
+                    interval_end,
+                    0,
+                    per,
+                    shared_pages=shared_pages,
+                )
+            total_pages = data['pagination'].get('total', 1)
+            return data, [
+                get_resumed_page(interval_resumed_pages[page])
+                if page < len(interval_resumed_pages)
+                else get_page(interval_start, interval_end, page)
+                for page in range(1, total_pages)
+            ]
+
+        def get_pending_tasks():
+            # NOTE: asyncio.all_tasks() is available since Python 3.7, while
+            # Task.all_tasks() also returns tasks that are done
+            all_tasks = getattr(asyncio, 'all_tasks', None) \
+                or asyncio.Task.all_tasks
+            return {task for task in all_tasks(loop) if not task.done()}
+
+        async_session = loop.run_until_complete(open_session())
+        try:
+            interval_tasks = [
+                loop.create_task(get_interval_pages(
+                    interval_start,
+                    interval_end,
+                    first_pages.pop(interval_start, None),
+                    resumed_pages.get(interval_start, []),
+                ))
+                for interval_start, interval_end in intervals
+            ]
+            for (interval_start, interval_end), task in zip(
+                    intervals, interval_tasks):
+                data, page_futures = loop.run_until_complete(task)
+                yield interval_start, interval_end, data
+                for page_future in page_futures:
+                    yield interval_start, interval_end, \
+                        loop.run_until_complete(page_future)
+        finally:
+            # NOTE: Task that is cancelled right as its request completes
+            # may still go on and start requests of the next pages
+            pending = get_pending_tasks()
+            while pending:
+                for task in pending:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(
+                    *pending,
+                    return_exceptions=True
+                ))
+                pending = get_pending_tasks()
+            loop.run_until_complete(async_session.close())
+            loop.close()
+
+    @api.multi
+    def _ua_pb_interpay_get_report_page(
+            self, interval_start, interval_end, page,
+            per=None, shared_pages=None):
+        self.ensure_one()
+        if per is None:
+            per = self._ua_pb_interpay_get_page_size()
+        if shared_pages is None:
+            shared_pages = getattr(_ua_pb_interpay_pull, 'shared_pages', None)
+        if shared_pages is None:
+            return self._ua_pb_interpay_request_report_page(
+                interval_start,
+                interval_end,
+                page,
+                per,
+            )
+        key = (
+            self._ua_pb_interpay_get_credentials(),
+            interval_start,
+            interval_end,
+            page,
+            per,
+        )
+        data = shared_pages.get(key, self.id)
+        if data is None:
+            data = self._ua_pb_interpay_request_report_page(
+                interval_start,
+                interval_end,
+                page,
+                per,
+            )
+            shared_pages.put(key, data, self.id)
+        return data
+
+    @api.multi
+    async def _ua_pb_interpay_get_report_page_async(
+            self, async_session, interval_start, interval_end, page, per,
+            shared_pages=None):
+        self.ensure_one()
+        data = self._ua_pb_interpay_get_report_request(
+            interval_start,
+            interval_end,
+            page,
+            per,
+        )
+        if shared_pages is None:
+            return await self._ua_pb_interpay_retrieve_async(
+                async_session,
+                '/payment/report',
+                data,
+            )
+        key = (
+            self._ua_pb_interpay_get_credentials(),
+            interval_start,
+            interval_end,
+            page,
+            per,
+        )
+        page_data = shared_pages.get(key, self.id)
+        if page_data is None:
+            page_data = await self._ua_pb_interpay_retrieve_async(
+                async_session,
+                '/payment/report',
+                data,
+            )
+            shared_pages.put(key, page_data, self.id)
+        return page_data
+
+    @api.multi
+    def _ua_pb_interpay_request_report_page(
+            self, interval_start, interval_end, page, per):
+        self.ensure_one()
+        return self._ua_pb_interpay_retrieve(
+            '/payment/report',
+            self._ua_pb_interpay_get_report_request(
+                interval_start,
+                interval_end,
+                page,
+                per,
+            ),
+        )
+
+    @api.model
+    def _ua_pb_interpay_get_report_request(
+            self, interval_start, interval_end, page, per):
+        request_interval_start = interval_start \
+            .replace(tzinfo=utc) \
+            .astimezone(UA_PB_TIMEZONE) \
+            .replace(tzinfo=None)
+        request_interval_end = interval_end \
+            .replace(tzinfo=utc) \
+            .astimezone(UA_PB_TIMEZONE) \
+            .replace(tzinfo=None)
+        return {
+            'from': int(request_interval_start.timestamp()) * 1000,
+            'to': int(request_interval_end.timestamp()) * 1000,
+            'pagination': {
+                'page': page,
+                'per': per,
+            },
+        }
 
     @api.multi
     def _ua_pb_interpay_filter_transaction(
             self, transaction, interval_start, interval_end):
         self.ensure_one()
-        fields = transaction['fields']
-
-        if fields.get('STATE', 'SUCCESS') != 'SUCCESS':
+        # NOTE: Overrides may still pass raw {'fields': ...} transactions
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
+        if transaction.state != 'SUCCESS':
             return False
 
         timestamp = self._ua_pb_interpay_get_transaction_date(transaction)
@@ -256,16 +3301,9 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
     @api.multi
     def _ua_pb_interpay_get_transaction_date(self, transaction):
         self.ensure_one()
-        fields = transaction['fields']
-
-        # NOTE: CSV reports use this date, as well as filtering
-        date = fields.get('DATECREATE')
-        if date:
-            return date
-
-        date = fields.get('REFILLDATE')
-        if date:
-            return date
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
+        if transaction.epoch is not None:
+            return transaction.date
 
         raise UserError(_('Transaction has no date: %s') % (
             transaction,
@@ -274,15 +3312,9 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
     @api.multi
     def _ua_pb_interpay_get_transaction_description(self, transaction):
         self.ensure_one()
-        fields = transaction['fields']
-
-        description = fields.get('DESCRIPTION')
-        if description:
-            return self._ua_pb_interpay_string(description)
-
-        description = fields.get('REFILLDESCR')
-        if description:
-            return self._ua_pb_interpay_string(description)
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
+        if transaction.description:
+            return self._ua_pb_interpay_string(transaction.description)
 
         raise UserError(_('Transaction has no description: %s') % (
             transaction,
@@ -291,15 +3323,9 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
     @api.multi
     def _ua_pb_interpay_get_transaction_ref(self, transaction):
         self.ensure_one()
-        fields = transaction['fields']
-
-        ref = fields.get('PAYMENTREF')
-        if ref:
-            return self._ua_pb_interpay_string(ref)
-
-        ref = fields.get('REFILLREF')
-        if ref:
-            return self._ua_pb_interpay_string(ref)
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
+        if transaction.ref:
+            return self._ua_pb_interpay_string(transaction.ref)
 
         raise UserError(_('Transaction has no ref: %s') % (
             transaction,
@@ -308,17 +3334,9 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
     @api.multi
     def _ua_pb_interpay_get_transaction_amount(self, transaction):
         self.ensure_one()
-        fields = transaction['fields']
-
-        amount = fields.get('AMTDEBIT')
-        if amount is not None:
-            amount = self._ua_pb_interpay_decimal(amount)
-            return amount.copy_abs().copy_negate()
-
-        amount = fields.get('REFILLAMT')
-        if amount is not None:
-            amount = self._ua_pb_interpay_decimal(amount)
-            return amount.copy_abs()
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
+        if transaction.amount is not None:
+            return transaction.amount
 
         raise UserError(_('Transaction amount not found: %s') % (
             transaction,
@@ -327,16 +3345,10 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
     @api.multi
     def _ua_pb_interpay_get_our_account_number(self, transaction):
         self.ensure_one()
-        fields = transaction['fields']
-
-        if 'REFILLCREDACC' in fields:
-            return self._sanitize_bank_account_number(
-                self._ua_pb_interpay_string(fields['REFILLCREDACC'])
-            )
-
-        if 'EXTACC' in fields:
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
+        if transaction.our_account is not None:
             return self._sanitize_bank_account_number(
-                self._ua_pb_interpay_string(fields['EXTACC'])
+                self._ua_pb_interpay_string(transaction.our_account)
             )
 
         raise UserError(_('Transaction has no origin account: %s') % (
@@ -346,16 +3358,9 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
     @api.multi
     def _ua_pb_interpay_get_partner_bank_account(self, transaction):
         self.ensure_one()
-        fields = transaction['fields']
-
-        if 'REFILLDEBACC' in fields:
-            return self._ua_pb_interpay_string(fields['REFILLDEBACC'])
-
-        if 'ACC2600' in fields:
-            return self._ua_pb_interpay_string(fields['ACC2600'])
-
-        if 'CARD' in fields:
-            return self._ua_pb_interpay_string(fields['CARD'])
+        transaction = self._ua_pb_interpay_preparse_transaction(transaction)
+        if transaction.partner_account is not None:
+            return self._ua_pb_interpay_string(transaction.partner_account)
 
         raise UserError(_('Transaction has recipient bank account: %s') % (
             transaction,
@@ -363,6 +3368,160 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
 
     @api.multi
     def _ua_pb_interpay_retrieve(self, endpoint, data=None, method='POST'):
+        self.ensure_one()
+        url, data, headers = self._ua_pb_interpay_prepare_request(
+            endpoint,
+            data,
+        )
+        stats = self._ua_pb_interpay_get_pull_stats()
+        context = self._ua_pb_interpay_get_ssl_context()
+        session = self._ua_pb_interpay_get_session()
+
+        # NOTE: Nonce is reused across requests, re-challenge only on 401
+        challenged = False
+        rechallenged = False
+        attempt = 0
+        with session.handshake_lock:
+            if not session.digest_auth:
+                with stats.measure('handshake'):
+                    session.set_digest_auth(self._ua_pb_interpay_digest_auth(
+                        session,
+                        self._ua_pb_interpay_parse_authenticate(
+                            self._ua_pb_interpay_handshake(
+                                session,
+                                context,
+                                Request(url, data, headers, method=method),
+                            )
+                        ),
+                    ))
+                challenged = True
+        while True:
+            request, authenticate = self._ua_pb_interpay_authorize_request(
+                session,
+                url,
+                data,
+                headers,
+                method,
+            )
+            stats.count('requests')
+            stats.count('bytes_sent', len(data or b''))
+            requested = time.perf_counter()
+            try:
+                with self._ua_pb_interpay_urlopen(
+                    request,
+                    session=session,
+                    context=context,
+                ) as response:
+                    responded = time.perf_counter()
+                    content = response.read()
+                    read = time.perf_counter()
+                    read_time = 0.0
+                    if isinstance(response, UaPbInterpayResponse):
+                        read_time = response.read_time
+                    stats.add_time(
+                        'request',
+                        responded - requested - read_time,
+                    )
+                    stats.add_time('read', read - responded + read_time)
+                    stats.count('bytes_received', len(content))
+                    charset = response.headers.get_content_charset()
+                break
+            except HTTPError as e:
+                if e.code != 401:
+                    self._ua_pb_interpay_backoff(e, attempt)
+                    attempt += 1
+                    continue
+                if self._ua_pb_interpay_rechallenge(
+                        session, e, authenticate, challenged, rechallenged):
+                    rechallenged = True
+            except (URLError, socket.timeout, ConnectionError) as e:
+                self._ua_pb_interpay_backoff(e, attempt)
+                attempt += 1
+
+        return self._ua_pb_interpay_parse_content(content, charset)
+
+    @api.multi
+    async def _ua_pb_interpay_retrieve_async(
+            self, async_session, endpoint, data=None, method='POST'):
+        """Same as _ua_pb_interpay_retrieve(), performed by async_session"""
+        self.ensure_one()
+        url, data, headers = self._ua_pb_interpay_prepare_request(
+            endpoint,
+            data,
+        )
+        stats = self._ua_pb_interpay_get_pull_stats()
+        context = self._ua_pb_interpay_get_ssl_context()
+        session = async_session.session
+
+        challenged = False
+        rechallenged = False
+        attempt = 0
+        async with async_session.handshake_lock:
+            if not session.digest_auth:
+                with stats.measure('handshake'):
+                    session.set_digest_auth(self._ua_pb_interpay_digest_auth(
+                        session,
+                        self._ua_pb_interpay_parse_authenticate(
+                            await self._ua_pb_interpay_handshake_async(
+                                async_session,
+                                context,
+                                Request(url, data, headers, method=method),
+                            )
+                        ),
+                    ))
+                challenged = True
+        while True:
+            try:
+                # NOTE: Nonce count is taken once the request can be sent,
+                # for nonce not to go stale while waiting for a slot
+                async with async_session.slot():
+                    request, authenticate = \
+                        self._ua_pb_interpay_authorize_request(
+                            session,
+                            url,
+                            data,
+                            headers,
+                            method,
+                        )
+                    stats.count('requests')
+                    stats.count('bytes_sent', len(data or b''))
+                    requested = time.perf_counter()
+                    response = await self._ua_pb_interpay_urlopen_async(
+                        request,
+                        async_session,
+                        context=context,
+                    )
+                responded = time.perf_counter()
+                stats.add_time(
+                    'request',
+                    responded - requested - response.read_time,
+                )
+                stats.add_time('read', response.read_time)
+                content = response.read()
+                stats.count('bytes_received', len(content))
+                charset = response.headers.get_content_charset()
+                break
+            except HTTPError as e:
+                if e.code != 401:
+                    await asyncio.sleep(
+                        self._ua_pb_interpay_get_backoff_delay(e, attempt)
+                    )
+                    attempt += 1
+                    continue
+                if self._ua_pb_interpay_rechallenge(
+                        session, e, authenticate, challenged, rechallenged):
+                    rechallenged = True
+            except (URLError, socket.timeout, ConnectionError) as e:
+                await asyncio.sleep(
+                    self._ua_pb_interpay_get_backoff_delay(e, attempt)
+                )
+                attempt += 1
+
+        return self._ua_pb_interpay_parse_content(content, charset)
+
+    @api.multi
+    def _ua_pb_interpay_prepare_request(self, endpoint, data=None):
+        """Returns URL, encoded data and headers of a request"""
         self.ensure_one()
         if endpoint[0] != '/':
             endpoint = '/' + endpoint
@@ -378,25 +3537,173 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
         headers = {
             'Content-Type': 'application/json',
         }
-        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-        with NamedTemporaryFile() as certificate_file:
-            certificate_file.write(b64decode(self.certificate))
-            context.load_cert_chain(
-                certfile=certificate_file.name,
-                password=self.passphrase,
-            )
+        return url, data, headers
 
-        authenticate_data = None
-        try:
-            request = Request(url, data, headers, method=method)
-            with self._ua_pb_interpay_urlopen(request, context=context):
+    @api.multi
+    def _ua_pb_interpay_authorize_request(
+            self, session, url, data, headers, method):
+        """Returns request along with the challenge it was authorized by"""
+        self.ensure_one()
+        digest_auth, nc = session.next_nonce_count()
+        return Request(url, data, dict(headers, **{
+            'Authorization': self._ua_pb_interpay_authorization(
+                digest_auth,
+                nc,
+                method,
+                urlparse(url).path,
+                data,
+            ),
+        }), method=method), digest_auth
+
+    @api.model
+    def _ua_pb_interpay_rechallenge(
+            self, session, error, digest_auth, challenged, rechallenged):
+        """Renews Digest challenge of the session after HTTP 401, unless
+        the challenge was just received or renewed already. Returns False if
+        another request renewed it meanwhile, thus it's only to be retried."""
+        if session.digest_auth is not digest_auth:
+            return False
+        if rechallenged:
+            raise error
+        authenticate = self._ua_pb_interpay_parse_authenticate(
+            error.headers['WWW-Authenticate']
+        )
+        stale = authenticate.get('stale', '').lower() == 'true'
+        if challenged and not stale:
+            raise error
+        session.set_digest_auth(
+            self._ua_pb_interpay_digest_auth(session, authenticate)
+        )
+        return True
+
+    @api.multi
+    def _ua_pb_interpay_parse_content(self, content, charset=None):
+        self.ensure_one()
+        with self._ua_pb_interpay_get_pull_stats().measure('decode'):
+            content = self._ua_pb_interpay_decode_content(content, charset)
+        if 'code' in content:
+            # NOTE: If error is "no data", simulate empty response
+            if content['code'] in ['IP0184']:
+                return {
+                    'list': [],
+                    'pagination': {
+                        'total': 0,
+                    },
+                }
+            raise UserError('%s: %s' % (
+                content['code'],
+                content.get('message', _('Unknown error')),
+            ))
+        return content
+
+    @api.model
+    def _ua_pb_interpay_decode_content(self, content, charset=None):
+        """Returns JSON content of a response, non-integer numbers (amounts
+        and balances) as Decimal built from their literal text"""
+        # NOTE: Decoder detects UTF-8 (and UTF-16/32) itself, thus bytes are
+        # passed as is, while legacy charsets (and any charset on Python 3.5)
+        # are decoded up front. Amounts are kept exactly as InterPay
+        # formatted them (e.g. 901.50 stays 901.50), which rules out
+        # backends that parse numbers to float, like orjson.
+        if not UA_PB_INTERPAY_JSON_BYTES:
+            content = content.decode(charset or 'utf-8')
+        elif charset and codecs.lookup(charset).name != 'utf-8':
+            content = content.decode(charset)
+        return json.loads(content, parse_float=Decimal)
+
+    @api.multi
+    def _ua_pb_interpay_handshake(self, session, context, request):
+        self.ensure_one()
+        attempt = 0
+        while True:
+            try:
+                with self._ua_pb_interpay_urlopen(
+                    request,
+                    session=session,
+                    context=context,
+                ):
+                    raise UserError(_('Failed to perform handshake'))
+            except HTTPError as e:
+                if e.code == 401:
+                    return e.headers['WWW-Authenticate']
+                self._ua_pb_interpay_backoff(e, attempt)
+            except (URLError, socket.timeout, ConnectionError) as e:
+                self._ua_pb_interpay_backoff(e, attempt)
+            attempt += 1
+
+    @api.multi
+    async def _ua_pb_interpay_handshake_async(
+            self, async_session, context, request):
+        self.ensure_one()
+        attempt = 0
+        while True:
+            try:
+                async with async_session.slot():
+                    await self._ua_pb_interpay_urlopen_async(
+                        request,
+                        async_session,
+                        context=context,
+                    )
                 raise UserError(_('Failed to perform handshake'))
-        except HTTPError as e:
-            if e.code != 401:
-                raise e
-            authenticate_data = e.headers['WWW-Authenticate']
+            except HTTPError as e:
+                if e.code == 401:
+                    return e.headers['WWW-Authenticate']
+                error = e
+            except (URLError, socket.timeout, ConnectionError) as e:
+                error = e
+            await asyncio.sleep(
+                self._ua_pb_interpay_get_backoff_delay(error, attempt)
+            )
+            attempt += 1
+
+    @api.multi
+    def _ua_pb_interpay_backoff(self, error, attempt):
+        """Wait before retrying a failed request or re-raise the error if
+        it's not transient or retries are exhausted"""
+        time.sleep(self._ua_pb_interpay_get_backoff_delay(error, attempt))
+
+    @api.multi
+    def _ua_pb_interpay_get_backoff_delay(self, error, attempt):
+        delay = self._ua_pb_interpay_get_retry_delay(error, attempt)
+        if delay is None:
+            raise error
+        self._ua_pb_interpay_get_pull_stats().count('retries')
+        _logger.debug(
+            'Retrying InterPay request in %.3f s after: %s',
+            delay,
+            error,
+        )
+        return delay
+
+    @api.model
+    def _ua_pb_interpay_get_retry_delay(self, error, attempt):
+        if attempt >= UA_PB_INTERPAY_RETRIES:
+            return None
+        retry_after = None
+        if isinstance(error, HTTPError):
+            if error.code not in UA_PB_INTERPAY_RETRY_STATUSES:
+                return None
+            if error.headers:
+                retry_after = error.headers.get('Retry-After')
+        elif isinstance(error, URLError):
+            if not isinstance(error.reason, (socket.timeout, ConnectionError)):
+                return None
+        # NOTE: Exponential backoff with full jitter, to spread retries of
+        # concurrent requests
+        delay = random.uniform(0, min(
+            UA_PB_INTERPAY_BACKOFF * 2 ** attempt,
+            UA_PB_INTERPAY_MAX_BACKOFF,
+        ))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(
+                float(retry_after),
+                UA_PB_INTERPAY_MAX_BACKOFF,
+            ))
+        return delay
 
-        authenticate_data_parts = authenticate_data.partition(' ')
+    @api.model
+    def _ua_pb_interpay_parse_authenticate(self, authenticate_data):
+        authenticate_data_parts = (authenticate_data or '').partition(' ')
         if authenticate_data_parts[0] != 'Digest':
             raise UserError(_(
                 'Unsupported authentication method: %s'
@@ -414,94 +3721,97 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
             authenticate_data_parts[2].split(',')
         ))
 
-        realm = authenticate.get('realm')
-        if not realm:
+        if not authenticate.get('realm'):
             raise UserError(_('Authentication realm not specified'))
-        nonce = authenticate.get('nonce')
-        if not nonce:
+        if not authenticate.get('nonce'):
             raise UserError(_('Authentication nonce not specified'))
+        if not authenticate.get('algorithm'):
+            raise UserError(_('Authentication algorithm not specified'))
+        return authenticate
+
+    @api.multi
+    def _ua_pb_interpay_digest_auth(self, session, authenticate):
+        """Returns Digest auth state of the challenge, resolving hasher and
+        HA1 only once per realm and algorithm of the session, unless
+        credentials differ from the ones they were resolved for"""
+        self.ensure_one()
+        realm = authenticate['realm']
         qop = authenticate.get('qop')
+        if qop and qop not in ['auth', 'auth-int']:
+            raise UserError(_(
+                'Authentication qop not supported: %s'
+            ) % (qop,))
 
-        algorithm = authenticate.get('algorithm')
-        if not algorithm:
-            raise UserError(_('Authentication algorithm not specified'))
-        session_based = algorithm.endswith('-sess')
-        if session_based:
+        algorithm = authenticate['algorithm']
+        if algorithm.endswith('-sess'):
             algorithm = algorithm[0:-5]
-        algorithms = hashlib.algorithms_guaranteed | hashlib.algorithms_available
-        if algorithm not in algorithms and '-' in algorithm:
-            algorithm = algorithm.replace('-', '')
-        if algorithm not in algorithms:
-            algorithm = algorithm.lower()
-        if algorithm not in algorithms:
-            raise UserError(_(
-                'Authentication algorithm not supported: %s'
-            ) % (algorithm,))
-        hasher = hashlib.new(algorithm)
+        # NOTE: Session is dropped on write only by the process that
+        # changed credentials, others have to notice the change themselves
+        credentials = (
+            self.username,
+            hashlib.sha256((self.password or '').encode('utf-8')).hexdigest(),
+        )
+        key = (realm, algorithm)
+        cached = session.realms.get(key)
+        if cached and cached[0] == credentials:
+            hasher_ha1 = cached[1:]
+        else:
+            algorithms = \
+                hashlib.algorithms_guaranteed | hashlib.algorithms_available
+            if algorithm not in algorithms and '-' in algorithm:
+                algorithm = algorithm.replace('-', '')
+            if algorithm not in algorithms:
+                algorithm = algorithm.lower()
+            if algorithm not in algorithms:
+                raise UserError(_(
+                    'Authentication algorithm not supported: %s'
+                ) % (algorithm,))
+            hasher = hashlib.new(algorithm)
+            a1_hasher = hasher.copy()
+            a1_hasher.update(('%s:%s:%s' % (
+                self.username,
+                realm,
+                self.password
+            )).encode('utf-8'))
+            hasher_ha1 = (hasher, a1_hasher.hexdigest())
+            session.realms[key] = (credentials,) + hasher_ha1
+        return UaPbInterpayDigestAuth(authenticate, *hasher_ha1)
 
-        uri = urlparse(url).path
+    @api.multi
+    def _ua_pb_interpay_authorization(
+            self, digest_auth, nc, method, uri, data):
+        self.ensure_one()
+        authenticate = digest_auth.authenticate
+        qop = authenticate.get('qop')
 
         authorization = dict(authenticate)
+        authorization.pop('stale', None)
         authorization['username'] = self.username
         authorization['uri'] = uri
         if qop:
-            if qop not in ['auth', 'auth-int']:
-                raise UserError(_(
-                    'Authentication qop not supported: %s'
-                ) % (qop,))
-
-            cnonce = uuid4().hex[0:16]
-            nc = '00000001'
-
             authorization['qop'] = qop
             authorization['nc'] = nc
-            authorization['cnonce'] = cnonce
-
-            a1 = '%s:%s:%s' % (
-                self.username,
-                realm,
-                self.password
-            )
-            if session_based:
-                partial_a1_hasher = hasher.copy()
-                partial_a1_hasher.update(a1.encode('utf-8'))
-                a1 = '%s:%s:%s' % (
-                    partial_a1_hasher.hexdigest(),
-                    nonce,
-                    cnonce,
-                )
-            a1_hasher = hasher.copy()
-            a1_hasher.update(a1.encode('utf-8'))
-            hashed_a1 = a1_hasher.hexdigest()
+            authorization['cnonce'] = digest_auth.cnonce
 
             a2 = '%s:%s' % (
                 method,
                 uri,
             )
             if qop == 'auth-int':
-                partial_a2_hasher = hasher.copy()
-                if data:
-                    partial_a2_hasher.update(data)
                 a2 = '%s:%s' % (
                     a2,
-                    partial_a2_hasher.hexdigest(),
+                    digest_auth.hash(data or b''),
+                )
+            authorization['response'] = digest_auth.hash(
+                '%s:%s:%s:%s:%s:%s' % (
+                    digest_auth.ha1,
+                    authenticate['nonce'],
+                    nc,
+                    digest_auth.cnonce,
+                    qop,
+                    digest_auth.hash(a2),
                 )
-            a2_hasher = hasher.copy()
-            a2_hasher.update(a2.encode('utf-8'))
-            hashed_a2 = a2_hasher.hexdigest()
-
-            response = '%s:%s:%s:%s:%s:%s' % (
-                hashed_a1,
-                nonce,
-                nc,
-                cnonce,
-                qop,
-                hashed_a2,
             )
-            response_hasher = hasher.copy()
-            response_hasher.update(response.encode('utf-8'))
-            hashed_response = response_hasher.hexdigest()
-            authorization['response'] = hashed_response
 
         def encode_auth_component(item):
             key, value = item
@@ -511,33 +3821,147 @@ class OnlineBankStatementProviderUaPbInterpay(models.Model):
                 key,
                 value,
             )
-        authorization_data = 'Digest ' + ', '.join(list(map(
+        return 'Digest ' + ', '.join(list(map(
             encode_auth_component,
             authorization.items()
         )))
-        headers['Authorization'] = authorization_data
 
-        request = Request(url, data, headers, method=method)
-        with self._ua_pb_interpay_urlopen(request, context=context) \
-                as response:
-            content = response.read().decode(
-                response.headers.get_content_charset()
+    @api.multi
+    def _ua_pb_interpay_get_ssl_context(self):
+        self.ensure_one()
+        certificate = self.certificate or b''
+        if isinstance(certificate, str):
+            certificate = certificate.encode('ascii')
+        passphrase = self.passphrase or ''
+        digest = hashlib.sha256(
+            certificate + b':' + passphrase.encode('utf-8')
+        ).hexdigest()
+
+        key = (self.env.cr.dbname, self.id)
+        with _ua_pb_interpay_ssl_contexts_lock:
+            cached = _ua_pb_interpay_ssl_contexts.get(key)
+            if cached and cached[0] == digest:
+                return cached[1]
+
+            # NOTE: Purpose.CLIENT_AUTH gives a server-side context since
+            # Python 3.10, while InterPay certificate has to be verified
+            context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
+            with self._ua_pb_interpay_get_pull_stats().measure('cert_load'):
+                self._ua_pb_interpay_load_cert_chain(
+                    context,
+                    b64decode(certificate),
+                    self.passphrase,
+                )
+            _ua_pb_interpay_ssl_contexts[key] = (digest, context)
+        return context
+
+    @api.model
+    def _ua_pb_interpay_load_cert_chain(
+            self, context, certificate, passphrase):
+        # NOTE: ssl module loads certificates only from files, thus use an
+        # anonymous in-memory file where supported (Linux, Python 3.8+)
+        memfd_create = getattr(os, 'memfd_create', None)
+        if memfd_create:
+            certificate_fd = memfd_create('certificate')
+            with os.fdopen(certificate_fd, 'wb') as certificate_file:
+                certificate_file.write(certificate)
+                certificate_file.flush()
+                context.load_cert_chain(
+                    certfile='/proc/self/fd/%d' % certificate_file.fileno(),
+                    password=passphrase,
+                )
+            return
+        with NamedTemporaryFile() as certificate_file:
+            certificate_file.write(certificate)
+            certificate_file.flush()
+            context.load_cert_chain(
+                certfile=certificate_file.name,
+                password=passphrase,
             )
-        content = json.loads(content, parse_float=Decimal)
-        if 'code' in content:
-            # NOTE: If error is "no data", simulate empty response
-            if content['code'] in ['IP0184']:
-                return {
-                    'list': [],
-                    'pagination': {
-                        'total': 0,
-                    },
-                }
-            raise UserError('%s: %s' % (
-                content['code'],
-                content.get('message', _('Unknown error')),
-            ))
-        return content
 
-    def _ua_pb_interpay_urlopen(self, request, **kwargs):
+    @api.multi
+    def _ua_pb_interpay_drop_ssl_context(self):
+        with _ua_pb_interpay_ssl_contexts_lock:
+            for provider in self:
+                _ua_pb_interpay_ssl_contexts.pop(
+                    (self.env.cr.dbname, provider.id),
+                    None
+                )
+
+    @api.multi
+    def _ua_pb_interpay_get_session(self):
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        with _ua_pb_interpay_sessions_lock:
+            session = _ua_pb_interpay_sessions.get(key)
+            if session is None:
+                session = UaPbInterpaySession(
+                    concurrency=self.ua_pb_interpay_concurrency or 1,
+                    rate_limiter=self._ua_pb_interpay_get_rate_limiter(),
+                )
+                _ua_pb_interpay_sessions[key] = session
+        return session
+
+    @api.multi
+    def _ua_pb_interpay_get_rate_limit(self):
+        """Returns the lowest rate limit set on InterPay providers that use
+        the same login, since they share the rate limiter"""
+        self.ensure_one()
+        credentials = self._ua_pb_interpay_get_credentials()
+        providers = self.sudo().with_context(active_test=False).search([
+            ('service', '=', 'ua_pb_interpay'),
+            ('username', '=', self.username),
+            ('ua_pb_interpay_rate_limit', '>', 0),
+        ]).filtered(
+            lambda provider:
+            provider._ua_pb_interpay_get_credentials() == credentials
+        )
+        return min(
+            providers.mapped('ua_pb_interpay_rate_limit'),
+            default=0.0,
+        )
+
+    @api.multi
+    def _ua_pb_interpay_get_rate_limiter(self):
+        self.ensure_one()
+        rate = self._ua_pb_interpay_get_rate_limit()
+        if not rate:
+            return None
+        api_base, username = self._ua_pb_interpay_get_credentials()
+        key = (self.env.cr.dbname, api_base, username)
+        with _ua_pb_interpay_rate_limiters_lock:
+            rate_limiter = _ua_pb_interpay_rate_limiters.get(key)
+            if rate_limiter is None:
+                # NOTE: Tokens are taken by workers of the pull as well, thus
+                # each time with a cursor of its own
+                rate_limiter = UaPbInterpaySharedRateLimiter(
+                    rate,
+                    self.pool.cursor,
+                    '%s %s' % (api_base, username),
+                )
+                _ua_pb_interpay_rate_limiters[key] = rate_limiter
+            else:
+                rate_limiter.set_rate(rate)
+        return rate_limiter
+
+    @api.multi
+    def _ua_pb_interpay_drop_session(self):
+        with _ua_pb_interpay_sessions_lock:
+            sessions = [
+                _ua_pb_interpay_sessions.pop(
+                    (self.env.cr.dbname, provider.id),
+                    None
+                )
+                for provider in self
+            ]
+        for session in filter(None, sessions):
+            session.close()
+
+    def _ua_pb_interpay_urlopen(self, request, session=None, **kwargs):
+        if session is not None:
+            return session.urlopen(request, **kwargs)
         return urlopen(request, **kwargs)
+
+    async def _ua_pb_interpay_urlopen_async(
+            self, request, async_session, **kwargs):
+        return await async_session.urlopen(request, **kwargs)
@@ -0,0 +1,29 @@
+# Copyright 2026 CorporateHub (https://corporatehub.eu)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from odoo import fields, models
+
+
+class UaPbInterpayRateBucket(models.Model):
+    _name = 'ua.pb.interpay.rate.bucket'
+    _description = 'InterPay Rate Limit Bucket'
+    _log_access = False
+
+    login = fields.Char(
+        required=True,
+        index=True,
+    )
+    tokens = fields.Float(
+        required=True,
+    )
+    updated = fields.Datetime(
+        required=True,
+    )
+
+    _sql_constraints = [
+        (
+            'login_uniq',
+            'UNIQUE(login)',
+            'Rate limit bucket of the login already exists',
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Copyright 2026 CorporateHub (https://corporatehub.eu)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from odoo import fields, models
+
+
+class UaPbInterpayReportPage(models.Model):
+    _name = 'ua.pb.interpay.report.page'
+    _description = 'InterPay Report Page'
+    _order = 'date_from, page'
+
+    provider_id = fields.Many2one(
+        string='Provider',
+        comodel_name='online.bank.statement.provider',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    account_number = fields.Char(
+        required=True,
+        index=True,
+    )
+    date_from = fields.Datetime(
+        required=True,
+        index=True,
+    )
+    date_to = fields.Datetime(
+        required=True,
+    )
+    page = fields.Integer(
+        required=True,
+    )
+    per = fields.Integer(
+        required=True,
+    )
+    total = fields.Integer(
+        help='Number of pages reported for the interval',
+    )
+    content = fields.Text(
+        required=True,
+    )
+    finalized = fields.Boolean(
+        help='Interval is older than settlement lag and can not change',
+    )
+
+    _sql_constraints = [
+        (
+            'page_uniq',
+            'UNIQUE('
+            'provider_id, account_number, date_from, date_to, page, per'
+            ')',
+            'Report page is already stored',
+        ),
+    ]
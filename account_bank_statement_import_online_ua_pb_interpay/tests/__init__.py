@@ -1,3 +1,4 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
 from . import test_account_bank_statement_import_online_ua_pb_interpay
+from . import test_benchmark_ua_pb_interpay
@@ -0,0 +1,300 @@
+# Copyright 2026 CorporateHub (https://corporatehub.eu)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+import hashlib
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import itertools
+import json
+import random
+import re
+from socketserver import ThreadingMixIn
+import ssl
+import threading
+import time
+from uuid import uuid4
+
+UA_PB_INTERPAY_FAKE_SERVER_PATH = '/inter-pay-service/api'
+UA_PB_INTERPAY_FAKE_SERVER_REPORT_PATH = re.compile(
+    r'^/inter-pay-service/api/payment/report/[0-9a-f-]+\.json$'
+)
+
+
+class UaPbInterpayFakeServer(object):
+    """Local stand-in for InterPay API that serves /payment/report.
+
+    Requests are authenticated with HTTP Digest, using the given algorithm
+    (e.g. MD5, MD5-sess, SHA-256-sess) and qop (auth or auth-int). A nonce
+    goes stale after nonce_uses requests or nonce_ttl seconds, if set. With
+    certfile and keyfile the server speaks TLS, with cafile it also requires
+    a client certificate issued by that CA.
+
+    Reports are produced by report.get_content(data), see
+    UaPbInterpayReportGenerator. Page size is capped by max_per. Every
+    request is delayed by latency seconds. Authenticated requests consume
+    errors one by one: None passes, an int is returned as HTTP status, a
+    str is returned as InterPay error code (e.g. IP0184). Other requests
+    fail with HTTP 503 at error_rate."""
+
+    def __init__(
+            self, report, username='username', password='password',
+            realm='InterPay', algorithm='MD5', qop='auth', nonce_uses=None,
+            nonce_ttl=None, latency=0.0, max_per=None, errors=None,
+            error_rate=0.0, certfile=None, keyfile=None, cafile=None,
+            host='127.0.0.1', port=0, seed=0):
+        self.report = report
+        self.username = username
+        self.password = password
+        self.realm = realm
+        self.algorithm = algorithm
+        self.qop = qop
+        self.nonce_uses = nonce_uses
+        self.nonce_ttl = nonce_ttl
+        self.latency = latency
+        self.max_per = max_per
+        self.errors = iter(errors or [])
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.nonces = {}
+        self.stats = {
+            'connections': 0,
+            'requests': 0,
+            'challenges': 0,
+            'stale': 0,
+            'errors': 0,
+            'reports': 0,
+            'max_in_flight': 0,
+        }
+        self.in_flight = 0
+
+        self.httpd = UaPbInterpayFakeHTTPServer((host, port), self)
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(getattr(
+                ssl,
+                'PROTOCOL_TLS_SERVER',
+                ssl.PROTOCOL_SSLv23
+            ))
+            context.load_cert_chain(certfile, keyfile)
+            if cafile:
+                context.verify_mode = ssl.CERT_REQUIRED
+                context.load_verify_locations(cafile)
+            self.httpd.socket = context.wrap_socket(
+                self.httpd.socket,
+                server_side=True,
+            )
+            self.scheme = 'https'
+        self.thread = None
+
+    @property
+    def api_base(self):
+        host, port = self.httpd.server_address[0:2]
+        return '%s://%s:%s%s' % (
+            self.scheme,
+            host,
+            port,
+            UA_PB_INTERPAY_FAKE_SERVER_PATH,
+        )
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever,
+            daemon=True,
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def issue_nonce(self):
+        nonce = uuid4().hex
+        with self.lock:
+            self.nonces[nonce] = [time.monotonic(), 0]
+        return nonce
+
+    def get_challenge(self, stale=False):
+        challenge = (
+            'Digest realm="%s", nonce="%s", qop="%s", algorithm=%s,'
+            ' opaque="%s"'
+        ) % (
+            self.realm,
+            self.issue_nonce(),
+            self.qop,
+            self.algorithm,
+            uuid4().hex,
+        )
+        if stale:
+            challenge += ', stale=true'
+        return challenge
+
+    def check_authorization(self, authorization, method, uri, body):
+        """Returns True if authorized, 'stale' if the nonce has to be
+        renewed, False otherwise"""
+        scheme, _sep, authorization = (authorization or '').partition(' ')
+        if scheme != 'Digest':
+            return False
+        components = {}
+        for component in authorization.split(','):
+            key, _sep, value = component.partition('=')
+            components[key.strip()] = value.strip().strip('"')
+        if components.get('username') != self.username \
+                or components.get('realm') != self.realm \
+                or components.get('uri') != uri \
+                or components.get('qop') != self.qop:
+            return False
+
+        algorithm = self.algorithm
+        session_based = algorithm.endswith('-sess')
+        if session_based:
+            algorithm = algorithm[0:-5]
+        algorithm = algorithm.replace('-', '').lower()
+
+        def hash_hex(value):
+            if isinstance(value, str):
+                value = value.encode('utf-8')
+            return hashlib.new(algorithm, value).hexdigest()
+
+        nonce = components.get('nonce', '')
+        cnonce = components.get('cnonce', '')
+        nc = components.get('nc', '')
+        a1 = '%s:%s:%s' % (self.username, self.realm, self.password)
+        if session_based:
+            a1 = '%s:%s:%s' % (hash_hex(a1), nonce, cnonce)
+        a2 = '%s:%s' % (method, uri)
+        if self.qop == 'auth-int':
+            a2 = '%s:%s' % (a2, hash_hex(body))
+        response = hash_hex('%s:%s:%s:%s:%s:%s' % (
+            hash_hex(a1),
+            nonce,
+            nc,
+            cnonce,
+            self.qop,
+            hash_hex(a2),
+        ))
+        if components.get('response') != response:
+            return False
+
+        with self.lock:
+            issued = self.nonces.get(nonce)
+            if issued is None:
+                return 'stale'
+            if self.nonce_ttl is not None \
+                    and time.monotonic() - issued[0] > self.nonce_ttl:
+                return 'stale'
+            if self.nonce_uses is not None \
+                    and issued[1] >= self.nonce_uses:
+                return 'stale'
+            issued[1] += 1
+        return True
+
+    def get_error(self):
+        with self.lock:
+            error = next(self.errors, None)
+            if error is None and self.error_rate \
+                    and self.random.random() < self.error_rate:
+                error = 503
+        return error
+
+
+class UaPbInterpayFakeHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, fake_server):
+        self.fake_server = fake_server
+        super().__init__(server_address, UaPbInterpayFakeRequestHandler)
+
+
+class UaPbInterpayFakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.fake_server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server.fake_server
+        with server.lock:
+            server.stats['requests'] += 1
+            server.in_flight += 1
+            server.stats['max_in_flight'] = max(
+                server.stats['max_in_flight'],
+                server.in_flight,
+            )
+        try:
+            self.handle_report()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def handle_report(self):
+        server = self.server.fake_server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if server.latency:
+            time.sleep(server.latency)
+
+        if not UA_PB_INTERPAY_FAKE_SERVER_REPORT_PATH.match(self.path):
+            self.respond(404)
+            return
+
+        authorized = server.check_authorization(
+            self.headers.get('Authorization'),
+            self.command,
+            self.path,
+            body,
+        )
+        if authorized is not True:
+            stale = authorized == 'stale'
+            server.count('stale' if stale else 'challenges')
+            self.respond(401, headers={
+                'WWW-Authenticate': server.get_challenge(stale=stale),
+            })
+            return
+
+        error = server.get_error()
+        if isinstance(error, int):
+            server.count('errors')
+            self.respond(error, b'{"message": "Injected error"}')
+            return
+        if error:
+            server.count('errors')
+            self.respond(200, json.dumps({
+                'code': error,
+                'message': 'Injected error',
+            }).encode('utf-8'))
+            return
+
+        data = json.loads(body.decode('utf-8'))
+        if server.max_per:
+            data['pagination']['per'] = min(
+                data['pagination']['per'],
+                server.max_per,
+            )
+        server.count('reports')
+        self.respond(200, server.report.get_content(data))
+
+    def respond(self, status, content=b'', headers=None):
+        self.send_response(status)
+        for header, value in itertools.chain(
+                (headers or {}).items(), [
+                    ('Content-Type', 'application/json; charset=utf-8'),
+                    ('Content-Length', str(len(content))),
+                ]):
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(content)
@@ -0,0 +1,135 @@
+# Copyright 2026 CorporateHub (https://corporatehub.eu)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from bisect import bisect_left
+from decimal import Decimal
+import json
+from math import ceil
+import random
+
+from pytz import utc
+
+from ..models.online_bank_statement_provider_ua_pb_interpay import (
+    UA_PB_TIMESTAMP_BASE,
+)
+
+# NOTE: Report windows are matched loosely, as a real report would be
+UA_PB_INTERPAY_REPORT_MARGIN = 24 * 60 * 60 * 1000
+
+
+class UaPbInterpayReportGenerator(object):
+    """Synthetic /payment/report of InterPay: refills and payments of several
+    accounts, some of them not successful, spread evenly over a period"""
+
+    def __init__(
+            self, account_number, date_since, date_until, count,
+            other_accounts=2, failed_ratio=0.03, seed=0):
+        rng = random.Random(seed)
+        self.account_numbers = [account_number] + [
+            '2600%010d' % (index + 1) for index in range(other_accounts)
+        ]
+        step = (date_until - date_since) / count
+        self.timestamps = []
+        self.transactions = []
+        self.amounts = {
+            account_number: [Decimal(0)]
+            for account_number in self.account_numbers
+        }
+        for index in range(count):
+            timestamp = self.get_timestamp(date_since + step * index)
+            account_number = rng.choice(self.account_numbers)
+            partner_account = '2600%010d' % rng.randrange(10 ** 9)
+            amount = Decimal(rng.randrange(1, 10 ** 7)) / 100
+            if rng.random() < 0.6:
+                transaction = {
+                    'REFILLDATE': timestamp,
+                    'REFILLCREDACC': account_number,
+                    'REFILLCCY': 'UAH',
+                    'REFILLAMT': float(amount),
+                    'REFILLREF': 'RF%08d' % index,
+                    'REFILLDESCR': 'Поповнення рахунку #%d' % index,
+                    'REFILLDEBACC': partner_account,
+                }
+            else:
+                state = 'SUCCESS'
+                if rng.random() < failed_ratio:
+                    state = rng.choice(['FAIL', 'PROCESSING'])
+                transaction = {
+                    'PAYMENTREF': 'P%08d' % index,
+                    'DATECREATE': timestamp,
+                    'DATECHANGE': timestamp + 60000,
+                    'ACC2600CCY': 'UAH',
+                    'AMTDEBIT': float(amount),
+                    'EXTACC': account_number,
+                    'EXTACCCCY': 'UAH',
+                    'CCYDEBIT': 'UAH',
+                    'STATE': state,
+                    'ERRORCODE': '000000',
+                    'DESCRIPTION': 'Оплата згідно рахунку №%d' % index,
+                    'CLIENTFIO': 'Петро ПЕТРЕНКО',
+                }
+                if rng.random() < 0.1:
+                    transaction['CARD'] = '5168%012d' % index
+                else:
+                    transaction['ACC2600'] = partner_account
+                amount = -amount if state == 'SUCCESS' else Decimal(0)
+            self.timestamps.append(timestamp)
+            self.transactions.append({'fields': transaction})
+            for turnover_account in self.account_numbers:
+                amounts = self.amounts[turnover_account]
+                amounts.append(amounts[-1] + (
+                    amount if turnover_account == account_number else 0
+                ))
+
+    @staticmethod
+    def get_timestamp(date):
+        return int(
+            (date.replace(tzinfo=utc) - UA_PB_TIMESTAMP_BASE).total_seconds()
+        ) * 1000
+
+    def get_content(self, data):
+        """Returns JSON-encoded report for request data, same as InterPay"""
+        start = bisect_left(self.timestamps, data['from'])
+        end = bisect_left(self.timestamps, data['to'])
+        first = bisect_left(
+            self.timestamps,
+            data['from'] - UA_PB_INTERPAY_REPORT_MARGIN,
+        )
+        last = bisect_left(
+            self.timestamps,
+            data['to'] + UA_PB_INTERPAY_REPORT_MARGIN,
+        )
+        if first == last:
+            return json.dumps({
+                'code': 'IP0184',
+                'message': 'No data found',
+            }).encode('utf-8')
+
+        page = data['pagination']['page']
+        per = data['pagination']['per']
+        offset = first + page * per
+        return json.dumps({
+            'list': self.transactions[offset:min(offset + per, last)],
+            'pagination': {
+                'page': page,
+                'per': per,
+                'total': ceil((last - first) / per),
+            },
+            'accountTurnovers': [{
+                'acc': account_number,
+                'ccy': 'UAH',
+                'startBalance': float(
+                    1000000 + self.amounts[account_number][start]
+                ),
+                'endBalance': float(
+                    1000000 + self.amounts[account_number][end]
+                ),
+            } for account_number in self.account_numbers],
+        }).encode('utf-8')
+
+    def get_report(self, data):
+        """Returns report for request data, as decoded by the provider"""
+        return json.loads(
+            self.get_content(data).decode('utf-8'),
+            parse_float=Decimal,
+        )
@@ -2,15 +2,42 @@
 # Copyright 2020 CorporateHub (https://corporatehub.eu)
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 
-from datetime import datetime
+from base64 import b64encode
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
+from copy import deepcopy
 from decimal import Decimal
+from email.message import Message
+import hashlib
+from io import BytesIO
 import json
+import os
+import shutil
+import ssl
+import subprocess
+from tempfile import TemporaryDirectory
+import threading
+import time
+import unittest
 from unittest import mock
+from urllib.error import HTTPError
 
+from pytz import utc
+
+from odoo.exceptions import UserError
 from odoo.tests import common
 from odoo import fields
 
+from ..models.online_bank_statement_provider_ua_pb_interpay import (
+    UA_PB_TIMESTAMP_BASE,
+    UaPbInterpayRateLimiter,
+    UaPbInterpaySharedPages,
+    UaPbInterpaySharedRateLimiter,
+)
+from .fake_server import UaPbInterpayFakeServer
+from .report_generator import UaPbInterpayReportGenerator
+
 _module_ns = 'odoo.addons' \
     '.account_bank_statement_import_online_ua_pb_interpay'
 _provider_class = (
@@ -177,3 +204,1949 @@ class TestAccountBankAccountStatementImportOnlineUaPbInterpay(
             'balance_start': 10000.0,
             'balance_end_real': 21443.5,
         })
+
+    def test_session_reuses_nonce(self):
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.write({
+            'username': 'username',
+            'password': 'password',
+            'certificate': b64encode(b'certificate'),
+        })
+        authorizations = []
+
+        def urlopen(request, **kwargs):
+            authorization = request.get_header('Authorization')
+            authorizations.append(authorization)
+            if not authorization:
+                raise HTTPError(request.full_url, 401, 'Unauthorized', {
+                    'WWW-Authenticate':
+                        'Digest realm="InterPay", nonce="NONCE",'
+                        ' qop="auth", algorithm="MD5"',
+                }, None)
+            headers = Message()
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+            return self._ua_pb_interpay_response(headers, b'{"list": []}')
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_get_ssl_context',
+        ), mock.patch(
+            _provider_class + '._ua_pb_interpay_urlopen',
+            side_effect=urlopen,
+        ):
+            provider._ua_pb_interpay_retrieve('/payment/report', {})
+            provider._ua_pb_interpay_retrieve('/payment/report', {})
+
+        self.assertEqual(len(authorizations), 3)
+        self.assertFalse(authorizations[0])
+        self.assertIn('nc="00000001"', authorizations[1])
+        self.assertIn('nc="00000002"', authorizations[2])
+
+    def test_session_caches_digest_auth(self):
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.write({
+            'username': 'username',
+            'password': 'password',
+            'certificate': b64encode(b'certificate'),
+        })
+        nonces = iter(['NONCE1', 'NONCE2'])
+        authorizations = []
+
+        def urlopen(request, **kwargs):
+            authorization = request.get_header('Authorization')
+            authorizations.append(authorization)
+            if not authorization or len(authorizations) == 3:
+                raise HTTPError(request.full_url, 401, 'Unauthorized', {
+                    'WWW-Authenticate':
+                        'Digest realm="InterPay", nonce="%s",'
+                        ' qop="auth", algorithm="MD5-sess", stale=true' % (
+                            next(nonces),
+                        ),
+                }, None)
+            headers = Message()
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+            return self._ua_pb_interpay_response(headers, b'{"list": []}')
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_get_ssl_context',
+        ), mock.patch(
+            _provider_class + '._ua_pb_interpay_urlopen',
+            side_effect=urlopen,
+        ), mock.patch(
+            _module_ns
+            + '.models.online_bank_statement_provider_ua_pb_interpay'
+            + '.hashlib.new',
+            wraps=hashlib.new,
+        ) as hashlib_new:
+            provider._ua_pb_interpay_retrieve('/payment/report', {})
+            provider._ua_pb_interpay_retrieve('/payment/report', {})
+            provider._ua_pb_interpay_retrieve('/payment/report', {})
+
+        self.assertEqual(hashlib_new.call_count, 1)
+        self.assertEqual(len(authorizations), 5)
+        self.assertIn('nonce="NONCE1"', authorizations[1])
+        self.assertIn('nonce="NONCE2"', authorizations[3])
+        self.assertIn('nc="00000001"', authorizations[3])
+        self.assertIn('nc="00000002"', authorizations[4])
+
+    def test_session_credentials_change(self):
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        report = UaPbInterpayReportGenerator(
+            '19190000000000',
+            datetime(2020, 1, 1),
+            datetime(2020, 1, 2),
+            10,
+        )
+        data = {
+            'from': 0,
+            'to': 0,
+            'pagination': {
+                'page': 0,
+                'per': 1000,
+            },
+        }
+        with UaPbInterpayFakeServer(report) as server, mock.patch(
+            _provider_class + '._ua_pb_interpay_get_ssl_context',
+        ):
+            provider.write({
+                'api_base': server.api_base,
+                'username': 'username',
+                'password': 'password',
+            })
+            provider._ua_pb_interpay_retrieve('/payment/report', data)
+
+            # NOTE: Password changed by another process keeps the session
+            server.password = 'new password'
+            self.env.cr.execute(
+                'UPDATE online_bank_statement_provider SET password = %s'
+                ' WHERE id = %s',
+                ('new password', provider.id)
+            )
+            provider.invalidate_cache()
+            provider._ua_pb_interpay_retrieve('/payment/report', data)
+            provider._ua_pb_interpay_retrieve('/payment/report', data)
+
+        self.assertEqual(server.stats['challenges'], 2)
+        self.assertEqual(server.stats['reports'], 3)
+
+    def test_ssl_context_cache(self):
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.write({
+            'certificate': b64encode(b'certificate'),
+        })
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_load_cert_chain',
+        ) as load_cert_chain:
+            context = provider._ua_pb_interpay_get_ssl_context()
+            self.assertIs(provider._ua_pb_interpay_get_ssl_context(), context)
+            self.assertEqual(load_cert_chain.call_count, 1)
+
+            provider.write({
+                'passphrase': 'passphrase',
+            })
+            self.assertIsNot(
+                provider._ua_pb_interpay_get_ssl_context(),
+                context
+            )
+            self.assertEqual(load_cert_chain.call_count, 2)
+
+    def test_concurrent_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        cursors = set()
+
+        def retrieve(provider, endpoint, data):
+            cursors.add(provider.env.cr)
+            page = data['pagination']['page']
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + (page + 1) * 3600000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('1.0'),
+                        'REFILLREF': '%s-%s' % (data['from'], page),
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                }],
+                'pagination': {
+                    'page': page,
+                    'per': 1000,
+                    'total': 3,
+                },
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+            autospec=True,
+        ):
+            sequential_transactions = \
+                provider._ua_pb_interpal_get_transactions(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 3, 1),
+                )
+            self.assertEqual(cursors, {self.env.cr})
+            cursors.clear()
+            provider.ua_pb_interpay_concurrency = 4
+            concurrent_transactions = \
+                provider._ua_pb_interpal_get_transactions(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 3, 1),
+                )
+
+        # NOTE: Workers request pages within environments of their own
+        self.assertTrue(cursors)
+        self.assertNotIn(self.env.cr, cursors)
+        self.assertEqual(len(sequential_transactions), 9)
+        self.assertEqual(
+            concurrent_transactions,
+            sequential_transactions,
+        )
+
+    def test_pull_balances(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        mocked_response = {
+            'list': [],
+            'pagination': {
+                'page': 0,
+                'per': 1000,
+                'total': 1,
+            },
+            'accountTurnovers': [{
+                'acc': '19190000000000',
+                'ccy': 'EUR',
+                'startBalance': Decimal('10000.0'),
+                'endBalance': Decimal('21443.5'),
+            }],
+        }
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            return_value=mocked_response,
+        ) as retrieve:
+            data = provider._obtain_statement_data(
+                datetime(2020, 2, 12),
+                datetime(2020, 2, 14),
+            )
+        self.assertEqual(retrieve.call_count, 1)
+        self.assertEqual(data[1], {
+            'balance_start': Decimal('10000.0'),
+            'balance_end_real': Decimal('21443.5'),
+        })
+
+        no_data_response = {
+            'list': [],
+            'pagination': {
+                'total': 0,
+            },
+        }
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=[no_data_response, mocked_response, mocked_response],
+        ) as retrieve:
+            data = provider._obtain_statement_data(
+                datetime(2020, 2, 12),
+                datetime(2020, 2, 14),
+            )
+        self.assertEqual(retrieve.call_count, 3)
+        self.assertEqual(data[1], {
+            'balance_start': Decimal('10000.0'),
+            'balance_end_real': Decimal('21443.5'),
+        })
+
+    def test_streaming_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+
+        def retrieve(endpoint, data):
+            page = data['pagination']['page']
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE':
+                            data['from'] + (index * 7 % 5 + 1) * 3600000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('1.0'),
+                        'REFILLREF': '%s-%s-%s' % (data['from'], page, index),
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                } for index in range(5)],
+                'pagination': {
+                    'page': page,
+                    'per': 1000,
+                    'total': 2,
+                },
+                'accountTurnovers': [{
+                    'acc': '19190000000000',
+                    'ccy': 'EUR',
+                    'startBalance': Decimal(data['from']),
+                    'endBalance': Decimal(data['to']),
+                }],
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ):
+            lines, values = provider._obtain_statement_data(
+                datetime(2020, 1, 1),
+                datetime(2020, 3, 1),
+            )
+            provider.ua_pb_interpay_streaming = True
+            streamed_lines, streamed_values = \
+                provider._obtain_statement_data(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 3, 1),
+                )
+            self.assertNotIsInstance(streamed_lines, list)
+            streamed_lines = list(streamed_lines)
+
+        self.assertEqual(len(lines), 30)
+        self.assertEqual(streamed_lines, lines)
+
+        provider.statement_creation_mode = 'monthly'
+        import_lines = type(provider)._ua_pb_interpay_import_lines
+        imported_lines = []
+
+        def import_streamed_lines(provider, statement, lines, *args, **kw):
+            imported_lines.append(lines)
+            return import_lines(provider, statement, lines, *args, **kw)
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ), mock.patch(
+            _provider_class + '._ua_pb_interpay_import_lines',
+            autospec=True,
+            side_effect=import_streamed_lines,
+        ):
+            provider._pull(
+                datetime(2020, 1, 1),
+                datetime(2020, 3, 1),
+            )
+
+        self.assertEqual(len(imported_lines), 2)
+        for lines in imported_lines:
+            self.assertNotIsInstance(lines, list)
+        statements = self.AccountBankStatement.search([
+            ('journal_id', '=', journal.id),
+        ])
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(len(statements.mapped('line_ids')), 40)
+        self.assertEqual(streamed_values, values)
+
+    def test_cached_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.ua_pb_interpay_cache = True
+
+        def retrieve(endpoint, data):
+            page = data['pagination']['page']
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + 3600000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('1.5'),
+                        'REFILLREF': '%s-%s' % (data['from'], page),
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                }],
+                'pagination': {
+                    'page': page,
+                    'per': 1000,
+                    'total': 2,
+                },
+                'accountTurnovers': [{
+                    'acc': '19190000000000',
+                    'ccy': 'EUR',
+                    'startBalance': Decimal('10000.0'),
+                    'endBalance': Decimal('21443.5'),
+                }],
+            }
+
+        window_start = provider._ua_pb_interpay_get_window_end(
+            datetime(2020, 1, 1),
+        )
+        window_end = provider._ua_pb_interpay_get_window_end(window_start)
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ) as mocked_retrieve:
+            data = provider._obtain_statement_data(
+                datetime(2020, 1, 1),
+                window_end,
+            )
+            self.assertEqual(mocked_retrieve.call_count, 4)
+            cached_data = provider._obtain_statement_data(
+                datetime(2020, 1, 1),
+                window_end,
+            )
+            self.assertEqual(mocked_retrieve.call_count, 6)
+            overlapping_data = provider._obtain_statement_data(
+                window_start - timedelta(days=1),
+                window_end + timedelta(days=1),
+            )
+            self.assertEqual(mocked_retrieve.call_count, 10)
+
+        self.assertEqual(len(data[0]), 4)
+        self.assertEqual(cached_data, data)
+        self.assertEqual(overlapping_data[0][2:4], data[0][2:])
+        self.assertEqual(
+            self.env['ua.pb.interpay.report.page'].search_count([
+                ('provider_id', '=', provider.id),
+            ]),
+            2
+        )
+
+    def test_incremental_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id.with_context(
+            scheduled=True,
+        )
+        transactions = [
+            ('REF-1', 1577880120000),
+            ('REF-2', 1577887320000),
+            ('REF-3', 1577887320000),
+        ]
+
+        def retrieve(endpoint, data):
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': date,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('1.5'),
+                        'REFILLREF': ref,
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                } for ref, date in transactions if date >= data['from']],
+                'pagination': {
+                    'page': 0,
+                    'per': data['pagination']['per'],
+                    'total': 1,
+                },
+                'accountTurnovers': [{
+                    'acc': '19190000000000',
+                    'ccy': 'EUR',
+                    'startBalance': Decimal('10000.0'),
+                    'endBalance': Decimal('21443.5'),
+                }],
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ) as mocked_retrieve:
+            lines, _ = provider._obtain_statement_data(
+                datetime(2020, 1, 1),
+                datetime(2020, 1, 2),
+            )
+            self.assertEqual(len(lines), 3)
+            self.assertEqual(
+                provider.ua_pb_interpay_cursor_date,
+                datetime(2020, 1, 1, 12),
+            )
+
+            transactions.append(('REF-4', 1577889120000))
+            mocked_retrieve.reset_mock()
+            lines, values = provider._obtain_statement_data(
+                datetime(2020, 1, 1),
+                datetime(2020, 1, 2),
+            )
+            self.assertEqual(
+                mocked_retrieve.call_args_list[0][0][1]['from'],
+                1577883600000,
+            )
+
+        self.assertEqual(
+            [line['unique_import_id'] for line in lines],
+            ['REF-4-1577881800'],
+        )
+        self.assertEqual(values['balance_start'], Decimal('10000.0'))
+        self.assertEqual(
+            provider.ua_pb_interpay_cursor_date,
+            datetime(2020, 1, 1, 12, 30),
+        )
+
+    def test_shared_pull(self):
+        providers = self.OnlineBankStatementProvider
+        for index, account_number in enumerate(['19190000000001',
+                                                '19190000000002']):
+            bank_account = self.ResPartnerBank.create({
+                'acc_number': account_number,
+                'partner_id': self.main_partner.id,
+            })
+            journal = self.AccountJournal.create({
+                'name': 'Bank %s' % index,
+                'type': 'bank',
+                'code': 'BANK%s' % index,
+                'currency_id': self.currency_eur.id,
+                'bank_statements_source': 'online',
+                'online_bank_statement_provider': 'ua_pb_interpay',
+                'bank_account_id': bank_account.id,
+            })
+            providers |= journal.online_bank_statement_provider_id
+        providers.write({
+            'username': 'USERNAME',
+        })
+
+        def retrieve(endpoint, data):
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + 3600000,
+                        'REFILLCREDACC': account_number,
+                        'REFILLAMT': Decimal('1.5'),
+                        'REFILLREF': 'REF-%s' % account_number,
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                } for account_number in ['19190000000001', '19190000000002']],
+                'pagination': {
+                    'page': 0,
+                    'per': 1000,
+                    'total': 1,
+                },
+                'accountTurnovers': [{
+                    'acc': account_number,
+                    'ccy': 'EUR',
+                    'startBalance': Decimal('10000.0'),
+                    'endBalance': Decimal('10001.5'),
+                } for account_number in ['19190000000001', '19190000000002']],
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ) as mocked_retrieve:
+            providers._pull(
+                datetime(2020, 1, 1),
+                datetime(2020, 1, 2),
+            )
+            self.assertEqual(mocked_retrieve.call_count, 1)
+
+        for provider in providers:
+            statement = self.AccountBankStatement.search([
+                ('journal_id', '=', provider.journal_id.id),
+            ])
+            self.assertEqual(len(statement), 1)
+            self.assertEqual(len(statement.line_ids), 1)
+            self.assertTrue(statement.line_ids.unique_import_id.endswith(
+                '-REF-%s-1577840280' % provider.account_number,
+            ))
+
+    def test_scheduled_pull(self):
+        providers = self.OnlineBankStatementProvider
+        for index, (account_number, username) in enumerate([
+                ('19190000000001', 'USERNAME-1'),
+                ('19190000000002', 'USERNAME-1'),
+                ('19190000000003', 'USERNAME-2')]):
+            bank_account = self.ResPartnerBank.create({
+                'acc_number': account_number,
+                'partner_id': self.main_partner.id,
+            })
+            journal = self.AccountJournal.create({
+                'name': 'Bank %s' % index,
+                'type': 'bank',
+                'code': 'BANK%s' % index,
+                'currency_id': self.currency_eur.id,
+                'bank_statements_source': 'online',
+                'online_bank_statement_provider': 'ua_pb_interpay',
+                'bank_account_id': bank_account.id,
+            })
+            provider = journal.online_bank_statement_provider_id
+            provider.write({
+                'username': username,
+                'interval_type': 'days',
+                'interval_number': 1,
+                'last_successful_run': datetime(2020, 1, 1),
+                'next_run': datetime(2020, 1, 2),
+            })
+            providers |= provider
+
+        account_numbers = providers.mapped('account_number')
+        threads = set()
+
+        def retrieve(endpoint, data):
+            threads.add(threading.current_thread())
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + 3600000,
+                        'REFILLCREDACC': account_number,
+                        'REFILLAMT': Decimal('1.5'),
+                        'REFILLREF': 'REF-%s' % account_number,
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                } for account_number in account_numbers],
+                'pagination': {
+                    'page': 0,
+                    'per': 1000,
+                    'total': 1,
+                },
+                'accountTurnovers': [{
+                    'acc': account_number,
+                    'ccy': 'EUR',
+                    'startBalance': Decimal('10000.0'),
+                    'endBalance': Decimal('10001.5'),
+                } for account_number in account_numbers],
+            }
+
+        # NOTE: Workers share the cursor of the test, one at a time
+        cursor_lock = threading.Lock()
+
+        @contextmanager
+        def get_worker_cursor():
+            with cursor_lock:
+                yield self.env.cr
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ) as mocked_retrieve, mock.patch(
+            _provider_class + '._ua_pb_interpay_get_worker_cursor_factory',
+            return_value=get_worker_cursor,
+        ):
+            self.OnlineBankStatementProvider._scheduled_pull()
+            self.assertEqual(mocked_retrieve.call_count, 2)
+        self.assertNotIn(threading.current_thread(), threads)
+
+        for provider in providers:
+            statement = self.AccountBankStatement.search([
+                ('journal_id', '=', provider.journal_id.id),
+            ])
+            self.assertEqual(len(statement), 1)
+            self.assertEqual(len(statement.line_ids), 1)
+            self.assertTrue(statement.line_ids.unique_import_id.endswith(
+                '-REF-%s-1577840280' % provider.account_number,
+            ))
+            self.assertEqual(provider.next_run, datetime(2020, 1, 3))
+            self.assertEqual(
+                provider.ua_pb_interpay_cursor_date,
+                datetime(2020, 1, 1, 0, 58),
+            )
+            self.assertTrue(provider.ua_pb_interpay_pull_stats)
+
+    def test_decode_content(self):
+        Provider = self.OnlineBankStatementProvider
+        content = '''{
+            "list": [{
+                "fields": {
+                    "AMTDEBIT": 901.50,
+                    "REFILLAMT": 1.2345678E7,
+                    "DATECREATE": 1581569961000,
+                    "ERRORCODE": "000000",
+                    "DESCRIPTION": "Оплата згідно рахунку"
+                }
+            }],
+            "pagination": {"page": 0, "per": 1000, "total": 1}
+        }'''
+        data = Provider._ua_pb_interpay_decode_content(
+            content.encode('utf-8'),
+            'utf-8',
+        )
+        self.assertEqual(data, json.loads(content, parse_float=Decimal))
+        fields = data['list'][0]['fields']
+        self.assertEqual(str(fields['AMTDEBIT']), '901.50')
+        self.assertEqual(str(fields['REFILLAMT']), '12345678')
+        self.assertEqual(fields['DATECREATE'], 1581569961000)
+        self.assertEqual(
+            Provider._ua_pb_interpay_decode_content(
+                content.encode('utf-8'),
+            ),
+            data,
+        )
+        self.assertEqual(
+            Provider._ua_pb_interpay_decode_content(
+                content.encode('cp1251'),
+                'windows-1251',
+            ),
+            data,
+        )
+        with mock.patch(
+            _module_ns + '.models'
+            '.online_bank_statement_provider_ua_pb_interpay'
+            '.UA_PB_INTERPAY_JSON_BYTES',
+            False,
+        ):
+            self.assertEqual(
+                Provider._ua_pb_interpay_decode_content(
+                    content.encode('utf-8'),
+                ),
+                data,
+            )
+
+    def test_normalize_page(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        data = {
+            'list': [{
+                'fields': {
+                    'REFILLDATE': 1581577281760,
+                    'REFILLCREDACC': '19190000000000',
+                    'REFILLAMT': Decimal('12345.0'),
+                    'REFILLREF': 'REF',
+                    'REFILLDESCR': 'DESCRIPTION',
+                    'REFILLDEBACC': '15000000000000',
+                },
+            }, {
+                'fields': {
+                    'PAYMENTREF': 'P12345',
+                    'DATECREATE': 1581582645120,
+                    'AMTDEBIT': '901,5',
+                    'STATE': 'SUCCESS',
+                    'ACC2600': '26000000000000',
+                    'DESCRIPTION': 'DESCRIPTION',
+                    'CLIENTFIO': 'Petro PETRENKO',
+                    'EXTACC': '1919 0000 0000 00',
+                },
+            }, {
+                'fields': {
+                    'PAYMENTREF': 'P12346',
+                    'DATECREATE': 1581582645120,
+                    'AMTDEBIT': Decimal('1.0'),
+                    'STATE': 'FAIL',
+                    'ACC2600': '26000000000000',
+                    'DESCRIPTION': 'DESCRIPTION',
+                    'EXTACC': '19190000000000',
+                },
+            }, {
+                'fields': {
+                    'PAYMENTREF': 'P12347',
+                    'DATECREATE': 1581582645120,
+                    'AMTDEBIT': Decimal('1.0'),
+                    'ACC2600': '26000000000000',
+                    'DESCRIPTION': 'DESCRIPTION',
+                    'EXTACC': '26000000000000',
+                },
+            }],
+        }
+
+        transactions = provider._ua_pb_interpay_normalize_page(
+            deepcopy(data),
+            datetime(2020, 2, 12),
+            datetime(2020, 2, 14),
+        )
+        self.assertEqual(len(transactions), 2)
+        self.assertEqual(
+            transactions,
+            provider._ua_pb_interpay_get_page_transactions(
+                deepcopy(data),
+                datetime(2020, 2, 12),
+                datetime(2020, 2, 14),
+            )
+        )
+        self.assertEqual(
+            list(provider._ua_pb_interpay_transactions_to_lines(
+                transactions
+            )),
+            [
+                line
+                for transaction in transactions
+                for line in provider._ua_pb_interpay_transaction_to_lines(
+                    transaction
+                )
+            ]
+        )
+        raw_transactions = [
+            transaction
+            for transaction in deepcopy(data)['list']
+            if provider._ua_pb_interpay_filter_transaction(
+                transaction,
+                datetime(2020, 2, 12),
+                datetime(2020, 2, 14),
+            )
+        ]
+        self.assertEqual(len(raw_transactions), 2)
+        self.assertEqual(
+            [
+                line
+                for transaction in raw_transactions
+                for line in provider._ua_pb_interpay_transaction_to_lines(
+                    transaction
+                )
+            ],
+            list(provider._ua_pb_interpay_transactions_to_lines(
+                transactions
+            )),
+        )
+        self.assertEqual(transactions[1]['fields'], {
+            'PAYMENTREF': 'P12345',
+            'DATECREATE': datetime(2020, 2, 13, 6, 28, 45, 120000),
+            'AMTDEBIT': Decimal('901.5'),
+            'STATE': 'SUCCESS',
+            'ACC2600': '26000000000000',
+            'DESCRIPTION': 'DESCRIPTION',
+            'CLIENTFIO': 'Petro PETRENKO',
+            'EXTACC': '1919 0000 0000 00',
+        })
+
+    def test_normalize_timestamps(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        timestamps = [
+            -7320001, -7320000, 0, 7319999, 7320000, 7320001, 7320999,
+            7321000, 1581577281760, 1581577281999, 1581577282000,
+        ]
+        data = {
+            'list': [{
+                'fields': {
+                    'REFILLDATE': timestamp,
+                    'REFILLCREDACC': '19190000000000',
+                    'REFILLAMT': Decimal('1.0'),
+                    'REFILLREF': 'REF',
+                    'REFILLDESCR': 'DESCRIPTION',
+                    'REFILLDEBACC': '15000000000000',
+                },
+            } for timestamp in timestamps],
+        }
+
+        for interval_start, interval_end in [
+                (datetime(1969, 12, 31), datetime(2021, 1, 1)),
+                (
+                    datetime(1969, 12, 31, 23, 59, 59, 999000),
+                    datetime(1970, 1, 1, 0, 0, 0, 999001),
+                ),
+                (
+                    datetime(2020, 2, 13, 4, 59, 21, 760001),
+                    datetime(2020, 2, 13, 4, 59, 22),
+                )]:
+            transactions = provider._ua_pb_interpay_normalize_page(
+                deepcopy(data),
+                interval_start,
+                interval_end,
+            )
+            expected_entries = []
+            for timestamp in timestamps:
+                date = (UA_PB_TIMESTAMP_BASE + timedelta(
+                    milliseconds=timestamp,
+                )).astimezone(utc).replace(tzinfo=None)
+                if date < interval_start or date >= interval_end:
+                    continue
+                expected_entries.append((date, 'REF-%s' % (
+                    int(date.timestamp()),
+                )))
+            self.assertTrue(expected_entries)
+            self.assertEqual(
+                [
+                    (line['date'], line['unique_import_id'])
+                    for line in provider._ua_pb_interpay_transactions_to_lines(
+                        transactions
+                    )
+                ],
+                expected_entries,
+            )
+
+    def test_fake_server_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.write({
+            'username': 'username',
+            'password': 'password',
+            'ua_pb_interpay_concurrency': 4,
+        })
+        report = UaPbInterpayReportGenerator(
+            '19190000000000',
+            datetime(2020, 1, 1),
+            datetime(2020, 4, 1),
+            3000,
+        )
+
+        data = None
+        for transport in ['threads', 'asyncio']:
+            provider.ua_pb_interpay_transport = transport
+            for options in [
+                {},
+                {'algorithm': 'MD5-sess'},
+                {'algorithm': 'SHA-256-sess', 'qop': 'auth-int'},
+                {'nonce_uses': 4},
+                {'max_per': 100, 'latency': 0.01},
+            ]:
+                with UaPbInterpayFakeServer(report, **options) as server, \
+                        mock.patch(
+                            _provider_class
+                            + '._ua_pb_interpay_get_ssl_context',
+                        ):
+                    provider.api_base = server.api_base
+                    server_data = provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 4, 1),
+                    )
+                self.assertEqual(server.stats['challenges'], 1, options)
+                self.assertLessEqual(
+                    server.stats['connections'],
+                    4,
+                    options
+                )
+                self.assertLessEqual(
+                    server.stats['max_in_flight'],
+                    4,
+                    options
+                )
+                if data is None:
+                    data = server_data
+                self.assertEqual(server_data, data, (transport, options))
+        self.assertTrue(data[0])
+
+        with UaPbInterpayFakeServer(report, errors=['IP0184']) as server, \
+                mock.patch(
+                    _provider_class + '._ua_pb_interpay_get_ssl_context',
+                ):
+            provider.write({
+                'api_base': server.api_base,
+                'ua_pb_interpay_concurrency': 1,
+            })
+            self.assertEqual(
+                provider._ua_pb_interpay_retrieve('/payment/report', {
+                    'from': 0,
+                    'to': 0,
+                    'pagination': {
+                        'page': 0,
+                        'per': 1000,
+                    },
+                })['list'],
+                []
+            )
+
+    @unittest.skipUnless(shutil.which('openssl'), 'openssl is required')
+    def test_fake_server_tls(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        report = UaPbInterpayReportGenerator(
+            '19190000000000',
+            datetime(2020, 1, 1),
+            datetime(2020, 2, 1),
+            100,
+        )
+        with TemporaryDirectory() as directory:
+            def openssl(*args):
+                subprocess.check_call(
+                    ('openssl',) + args,
+                    cwd=directory,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+            openssl(
+                'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                '-keyout', 'ca.key', '-out', 'ca.pem', '-days', '1',
+                '-subj', '/CN=CA',
+            )
+            with open(os.path.join(directory, 'server.ext'), 'w') as file:
+                file.write('subjectAltName=IP:127.0.0.1\n')
+            for name in ['server', 'client']:
+                openssl(
+                    'req', '-newkey', 'rsa:2048', '-nodes',
+                    '-keyout', name + '.key', '-out', name + '.csr',
+                    '-subj', '/CN=' + name,
+                )
+                openssl(
+                    'x509', '-req', '-in', name + '.csr', '-CA', 'ca.pem',
+                    '-CAkey', 'ca.key', '-CAcreateserial',
+                    '-out', name + '.pem', '-days', '1',
+                    *(['-extfile', 'server.ext'] if name == 'server' else [])
+                )
+            certificate = b''
+            for name in ['client.pem', 'client.key']:
+                with open(os.path.join(directory, name), 'rb') as file:
+                    certificate += file.read()
+
+            create_default_context = ssl.create_default_context
+            with UaPbInterpayFakeServer(
+                report,
+                certfile=os.path.join(directory, 'server.pem'),
+                keyfile=os.path.join(directory, 'server.key'),
+                cafile=os.path.join(directory, 'ca.pem'),
+            ) as server:
+                provider.write({
+                    'api_base': server.api_base,
+                    'username': 'username',
+                    'password': 'password',
+                    'certificate': b64encode(certificate),
+                })
+                with self.assertRaises(ssl.SSLError):
+                    provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 2, 1),
+                    )
+                provider._ua_pb_interpay_drop_ssl_context()
+
+                with mock.patch.object(
+                    ssl,
+                    'create_default_context',
+                    side_effect=lambda purpose: create_default_context(
+                        purpose,
+                        cafile=os.path.join(directory, 'ca.pem'),
+                    ),
+                ):
+                    data = provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 2, 1),
+                    )
+                    provider.ua_pb_interpay_transport = 'asyncio'
+                    asyncio_data = provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 2, 1),
+                    )
+
+        self.assertTrue(data[0])
+        self.assertEqual(asyncio_data, data)
+        self.assertEqual(server.stats['connections'], 2)
+
+    def test_adaptive_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.write({
+            'username': 'username',
+            'password': 'password',
+            'ua_pb_interpay_adaptive': True,
+        })
+        report = UaPbInterpayReportGenerator(
+            '19190000000000',
+            datetime(2020, 1, 1),
+            datetime(2020, 4, 1),
+            30000,
+        )
+
+        data = None
+        requests = []
+        with UaPbInterpayFakeServer(report, max_per=2000) as server, \
+                mock.patch(
+                    _provider_class + '._ua_pb_interpay_get_ssl_context',
+                ):
+            provider.api_base = server.api_base
+            for _pull in range(3):
+                reports = server.stats['reports']
+                pull_data = provider._obtain_statement_data(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 4, 1),
+                )
+                requests.append(server.stats['reports'] - reports)
+                if data is None:
+                    data = pull_data
+                self.assertEqual(pull_data, data)
+        self.assertTrue(data[0])
+        self.assertEqual(provider.ua_pb_interpay_page_size, 2000)
+        self.assertEqual(provider.ua_pb_interpay_page_size_limit, 2000)
+        self.assertLess(requests[-1], requests[0])
+
+        provider.write({
+            'ua_pb_interpay_window_size': 4,
+            'ua_pb_interpay_page_size': 1000,
+            'ua_pb_interpay_page_size_limit': 0,
+        })
+        report = UaPbInterpayReportGenerator(
+            '19190000000000',
+            datetime(2020, 1, 1),
+            datetime(2020, 4, 1),
+            100,
+        )
+        with UaPbInterpayFakeServer(report) as server, \
+                mock.patch(
+                    _provider_class + '._ua_pb_interpay_get_ssl_context',
+                ):
+            provider.api_base = server.api_base
+            for window_size in [8, 16, 30, 30]:
+                provider._obtain_statement_data(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 4, 1),
+                )
+                self.assertEqual(
+                    provider.ua_pb_interpay_window_size,
+                    window_size,
+                )
+
+    def test_retry_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.write({
+            'username': 'username',
+            'password': 'password',
+            'ua_pb_interpay_checkpoint': True,
+        })
+        report = UaPbInterpayReportGenerator(
+            '19190000000000',
+            datetime(2020, 1, 1),
+            datetime(2020, 4, 1),
+            12000,
+        )
+        UaPbInterpayReportPage = self.env['ua.pb.interpay.report.page']
+
+        with mock.patch(_module_ns + '.models'
+                        '.online_bank_statement_provider_ua_pb_interpay'
+                        '.time.sleep') as sleep, \
+                mock.patch(
+                    _provider_class + '._ua_pb_interpay_get_ssl_context',
+                ):
+            with UaPbInterpayFakeServer(report) as server:
+                provider.api_base = server.api_base
+                data = provider._obtain_statement_data(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 4, 1),
+                )
+            total_reports = server.stats['reports']
+            self.assertFalse(sleep.called)
+            self.assertFalse(UaPbInterpayReportPage.search([
+                ('provider_id', '=', provider.id),
+            ]))
+
+            with UaPbInterpayFakeServer(
+                report,
+                errors=[503, 502, None, 504],
+            ) as server:
+                provider.api_base = server.api_base
+                self.assertEqual(
+                    provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 4, 1),
+                    ),
+                    data,
+                )
+            self.assertEqual(server.stats['errors'], 3)
+            self.assertEqual(sleep.call_count, 3)
+
+            with UaPbInterpayFakeServer(report, errors=[400]) as server:
+                provider.api_base = server.api_base
+                with self.assertRaises(HTTPError):
+                    provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 4, 1),
+                    )
+            self.assertEqual(sleep.call_count, 3)
+
+            with UaPbInterpayFakeServer(
+                report,
+                errors=[None] * 5 + [503] * 5,
+            ) as server:
+                provider.api_base = server.api_base
+                with self.assertRaises(HTTPError):
+                    provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 4, 1),
+                    )
+            self.assertEqual(sleep.call_count, 7)
+            self.assertEqual(len(UaPbInterpayReportPage.search([
+                ('provider_id', '=', provider.id),
+            ])), 5)
+
+            with UaPbInterpayFakeServer(report) as server:
+                provider.api_base = server.api_base
+                self.assertEqual(
+                    provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 4, 1),
+                    ),
+                    data,
+                )
+            self.assertEqual(server.stats['reports'], total_reports - 5)
+            self.assertFalse(UaPbInterpayReportPage.search([
+                ('provider_id', '=', provider.id),
+            ]))
+
+    def test_pull_stats(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.write({
+            'username': 'username',
+            'password': 'password',
+        })
+        report = UaPbInterpayReportGenerator(
+            '19190000000000',
+            datetime(2020, 1, 1),
+            datetime(2020, 2, 1),
+            3000,
+        )
+
+        for streaming in [False, True]:
+            with UaPbInterpayFakeServer(report) as server, \
+                    mock.patch(
+                        _provider_class + '._ua_pb_interpay_get_ssl_context',
+                    ):
+                provider.write({
+                    'api_base': server.api_base,
+                    'ua_pb_interpay_streaming': streaming,
+                })
+                with self.assertLogs(_module_ns, level='INFO'):
+                    lines, _values = provider._obtain_statement_data(
+                        datetime(2020, 1, 1),
+                        datetime(2020, 2, 1),
+                    )
+                    lines = list(lines)
+            stats = json.loads(provider.ua_pb_interpay_pull_stats)
+            self.assertEqual(
+                stats['requests'],
+                server.stats['requests'] - server.stats['challenges'],
+            )
+            self.assertEqual(stats['pages'], server.stats['reports'])
+            self.assertEqual(stats['lines'], len(lines))
+            self.assertGreaterEqual(stats['transactions'], len(lines))
+            self.assertEqual(stats['date_since'], '2020-01-01 00:00:00')
+            self.assertGreater(stats['bytes_sent'], 0)
+            self.assertGreater(stats['bytes_received'], 0)
+            self.assertGreater(stats['transactions_per_second'], 0)
+            self.assertGreater(stats['timings']['handshake'], 0)
+            self.assertGreater(stats['timings']['request'], 0)
+            self.assertGreater(stats['timings']['decode'], 0)
+            self.assertGreater(stats['timings']['normalize'], 0)
+
+    def test_skip_imported(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+
+        def retrieve(endpoint, data):
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + (index + 1) * 3600000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('1.0'),
+                        'REFILLREF': 'REF%s' % index,
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                } for index in range(3)],
+                'pagination': {
+                    'page': 0,
+                    'per': 1000,
+                    'total': 1,
+                },
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ):
+            lines, _values = provider._obtain_statement_data(
+                datetime(2020, 1, 1),
+                datetime(2020, 1, 2),
+            )
+            self.assertEqual(len(lines), 3)
+            self.AccountBankStatement.create({
+                'name': 'Statement',
+                'journal_id': journal.id,
+                'line_ids': [(0, False, {
+                    'name': line['name'],
+                    'amount': line['amount'],
+                    'date': line['date'],
+                    'unique_import_id': provider._generate_unique_import_id(
+                        line['unique_import_id']
+                    ),
+                }) for line in lines[0:2]],
+            })
+
+            for streaming in [False, True]:
+                provider.ua_pb_interpay_streaming = streaming
+                new_lines, _values = provider._obtain_statement_data(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 1, 2),
+                )
+                self.assertEqual(list(new_lines), lines[2:])
+                stats = json.loads(provider.ua_pb_interpay_pull_stats)
+                self.assertEqual(stats['skipped'], 2)
+                self.assertEqual(stats['lines'], 1)
+
+    def test_bulk_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+        counterparty_bank_account = self.ResPartnerBank.create({
+            'acc_number': '15000000000000',
+            'partner_id': self.env['res.partner'].create({
+                'name': 'Counterparty',
+            }).id,
+        })
+        client = self.env['res.partner'].create({
+            'name': 'Petro PETRENKO',
+        })
+        # NOTE: Partners of other companies are not matched by name
+        self.env['res.partner'].create({
+            'name': 'Petro PETRENKO',
+            'company_id': self.env['res.company'].create({
+                'name': 'Other Company',
+            }).id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.ua_pb_interpay_bulk_import = True
+
+        def retrieve(endpoint, data):
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + 3600000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('10.0'),
+                        'REFILLREF': 'REF1',
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '1500 0000 0000 00',
+                    },
+                }, {
+                    'fields': {
+                        'PAYMENTREF': 'REF2',
+                        'DATECREATE': data['from'] + 7200000,
+                        'AMTDEBIT': Decimal('1.5'),
+                        'STATE': 'SUCCESS',
+                        'ACC2600': '26000000000000',
+                        'DESCRIPTION': 'DESCRIPTION',
+                        'CLIENTFIO': 'Petro PETRENKO',
+                        'EXTACC': '19190000000000',
+                    },
+                }, {
+                    'fields': {
+                        'REFILLDATE': data['from'] + 10800000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('2.0'),
+                        'REFILLREF': 'REF3',
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '16000000000000',
+                    },
+                }],
+                'pagination': {
+                    'page': 0,
+                    'per': 1000,
+                    'total': 1,
+                },
+                'accountTurnovers': [{
+                    'acc': '19190000000000',
+                    'ccy': 'EUR',
+                    'startBalance': Decimal('100.0'),
+                    'endBalance': Decimal('110.5'),
+                }],
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ):
+            for _pull in range(2):
+                provider._pull(
+                    datetime(2020, 1, 1),
+                    datetime(2020, 1, 2),
+                )
+
+        statement = self.AccountBankStatement.search([
+            ('journal_id', '=', journal.id),
+        ])
+        self.assertEqual(len(statement), 1)
+        self.assertEqual(statement.balance_start, 100.0)
+        self.assertEqual(statement.balance_end_real, 110.5)
+        lines = statement.line_ids.sorted('date')
+        self.assertEqual(lines.mapped('amount'), [10.0, -1.5, 2.0])
+        self.assertEqual(lines.mapped('account_number'), [
+            '15000000000000',
+            '26000000000000',
+            '16000000000000',
+        ])
+        self.assertEqual(lines[0].bank_account_id, counterparty_bank_account)
+        self.assertEqual(
+            lines[0].partner_id,
+            counterparty_bank_account.partner_id,
+        )
+        self.assertFalse(lines[1].bank_account_id)
+        self.assertEqual(lines[1].partner_id, client)
+        self.assertFalse(lines[2].bank_account_id)
+        self.assertFalse(lines[2].partner_id)
+        self.assertTrue(lines[0].unique_import_id.endswith('-REF1-1577840280'))
+
+    def test_counterparty_bank_accounts(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+        counterparty_bank_account = self.ResPartnerBank.create({
+            'acc_number': '15000000000000',
+            'partner_id': self.env['res.partner'].create({
+                'name': 'Counterparty',
+            }).id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        provider.ua_pb_interpay_bulk_import = True
+
+        def retrieve(endpoint, data):
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + index * 3600000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('1.0'),
+                        'REFILLREF': 'REF%s-%s' % (data['from'], index),
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': account_number,
+                    },
+                } for index, account_number in enumerate([
+                    '15000000000000',
+                    '16000000000000',
+                ], 1)],
+                'pagination': {
+                    'page': 0,
+                    'per': 1000,
+                    'total': 1,
+                },
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ):
+            provider._pull(
+                datetime(2020, 1, 1),
+                datetime(2020, 1, 2),
+            )
+            self.assertEqual(provider._ua_pb_interpay_get_counterparties({
+                '15000000000000',
+                '16000000000000',
+            }), {
+                '15000000000000': (
+                    counterparty_bank_account.id,
+                    counterparty_bank_account.partner_id.id,
+                ),
+            })
+
+            new_bank_account = self.ResPartnerBank.create({
+                'acc_number': '16000000000000',
+                'partner_id': self.main_partner.id,
+            })
+            provider._pull(
+                datetime(2020, 1, 2),
+                datetime(2020, 1, 3),
+            )
+
+        lines = self.AccountBankStatementLine.search([
+            ('journal_id', '=', journal.id),
+            ('account_number', '=', '15000000000000'),
+        ])
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(
+            lines.mapped('bank_account_id'),
+            counterparty_bank_account
+        )
+        lines = self.AccountBankStatementLine.search([
+            ('journal_id', '=', journal.id),
+            ('account_number', '=', '16000000000000'),
+        ], order='date')
+        self.assertEqual(len(lines), 2)
+        self.assertFalse(lines[0].bank_account_id)
+        self.assertEqual(lines[1].bank_account_id, new_bank_account)
+
+        shared_bank_account = self.ResPartnerBank.create({
+            'acc_number': '17000000000000',
+            'partner_id': self.env['res.partner'].create({
+                'name': 'Shared Counterparty',
+                'company_id': False,
+            }).id,
+        })
+        company_bank_account = self.ResPartnerBank.create({
+            'acc_number': '17000000000000',
+            'partner_id': self.env['res.partner'].create({
+                'name': 'Company Counterparty',
+                'company_id': provider.company_id.id,
+            }).id,
+        })
+        self.assertFalse(shared_bank_account.company_id)
+        self.assertEqual(
+            company_bank_account.company_id,
+            provider.company_id,
+        )
+        self.assertEqual(provider._ua_pb_interpay_get_counterparties({
+            '17000000000000',
+        }), {
+            '17000000000000': (
+                company_bank_account.id,
+                company_bank_account.partner_id.id,
+            ),
+        })
+
+    def test_background_pull(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        action = journal.action_online_bank_statements_pull_wizard()
+        wizard = self.env['online.bank.statement.pull.wizard'].with_context(
+            action['context']
+        ).create({
+            'date_since': datetime(2020, 1, 1),
+            'date_until': datetime(2020, 3, 15),
+            'ua_pb_interpay_background': True,
+        })
+        wizard.action_pull()
+        self.assertEqual(
+            provider.ua_pb_interpay_backfill_date,
+            datetime(2020, 1, 1),
+        )
+        self.assertFalse(self.AccountBankStatement.search([
+            ('journal_id', '=', journal.id),
+        ]))
+
+        failures = [
+            UaPbInterpayReportGenerator.get_timestamp(datetime(2020, 2, 10)),
+        ]
+
+        def retrieve(endpoint, data):
+            if data['from'] in failures:
+                failures.remove(data['from'])
+                raise UserError('Injected error')
+            return {
+                'list': [{
+                    'fields': {
+                        'REFILLDATE': data['from'] + 3600000,
+                        'REFILLCREDACC': '19190000000000',
+                        'REFILLAMT': Decimal('1.0'),
+                        'REFILLREF': 'REF',
+                        'REFILLDESCR': 'DESCRIPTION',
+                        'REFILLDEBACC': '15000000000000',
+                    },
+                }],
+                'pagination': {
+                    'page': 0,
+                    'per': 1000,
+                    'total': 1,
+                },
+            }
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=retrieve,
+        ):
+            self.OnlineBankStatementProvider._ua_pb_interpay_run_backfills()
+            self.assertEqual(
+                provider.ua_pb_interpay_backfill_date,
+                datetime(2020, 1, 31),
+            )
+            self.assertEqual(len(self.AccountBankStatement.search([
+                ('journal_id', '=', journal.id),
+            ])), 30)
+            self.assertIn(
+                'Backfill will be resumed from 2020-01-31',
+                provider.message_ids[0].body,
+            )
+
+            self.OnlineBankStatementProvider._ua_pb_interpay_run_backfills()
+            self.assertEqual(
+                provider.ua_pb_interpay_backfill_date,
+                datetime(2020, 3, 15),
+            )
+            self.assertEqual(len(self.AccountBankStatement.search([
+                ('journal_id', '=', journal.id),
+            ])), 74)
+
+    def test_import_export(self):
+        bank_account = self.ResPartnerBank.create({
+            'acc_number': '19190000000000',
+            'partner_id': self.main_partner.id,
+        })
+        journal = self.AccountJournal.create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.currency_eur.id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+
+        provider = journal.online_bank_statement_provider_id
+        json_export = '''{
+    "list": [
+        {
+            "fields": {
+                "REFILLDATE": 1581577281760,
+                "REFILLCREDACC": "19190000000000",
+                "REFILLCCY": "EUR",
+                "REFILLAMT": 12345.0,
+                "REFILLREF": "REF",
+                "REFILLDESCR": "DESCRIPTION",
+                "REFILLDEBACC": "15000000000000"
+            }
+        },
+        {
+            "fields": {
+                "PAYMENTREF": "P12345",
+                "DATECREATE": 1581668445120,
+                "AMTDEBIT": 901.5,
+                "STATE": "SUCCESS",
+                "ACC2600": "26000000000000",
+                "DESCRIPTION": "DESCRIPTION",
+                "CLIENTFIO": "Petro PETRENKO",
+                "EXTACC": "19190000000000"
+            }
+        }
+    ],
+    "pagination": {
+        "page": 0,
+        "per": 1000,
+        "total": 1
+    }
+}'''.encode('utf-8')
+        csv_export = (
+            'DATECREATE;AMTDEBIT;STATE;ACC2600;DESCRIPTION;PAYMENTREF;'
+            'EXTACC\r\n'
+            '1581668445120;901,5;SUCCESS;26000000000000;DESCRIPTION;P12345;'
+            '19190000000000\r\n'
+            '1581754845120;10;FAIL;26000000000000;DESCRIPTION;P12346;'
+            '19190000000000\r\n'
+            '1581754845120;1,5;SUCCESS;26000000000000;DESCRIPTION;P12347;'
+            '19190000000000\r\n'
+        ).encode('utf-8-sig')
+
+        with mock.patch(
+            _provider_class + '._ua_pb_interpay_retrieve',
+            side_effect=AssertionError('No requests expected'),
+        ):
+            self.assertEqual(
+                provider._ua_pb_interpay_import_export(BytesIO(json_export)),
+                (2, 2),
+            )
+            self.assertEqual(
+                provider._ua_pb_interpay_import_export(
+                    BytesIO(csv_export),
+                    file_format='csv',
+                ),
+                (3, 1),
+            )
+
+        statements = self.AccountBankStatement.search([
+            ('journal_id', '=', journal.id),
+        ], order='date')
+        self.assertEqual(len(statements), 3)
+        self.assertEqual(
+            statements.mapped('line_ids').sorted('date').mapped('amount'),
+            [12345.0, -901.5, -1.5],
+        )
+
+    def test_rate_limiter(self):
+        rate_limiter = UaPbInterpayRateLimiter(10.0)
+        started = time.monotonic()
+        for _request in range(15):
+            rate_limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.45)
+
+    def test_rate_limit_shared(self):
+        providers = self.OnlineBankStatementProvider
+        for index, (username, rate_limit) in enumerate([
+                ('USERNAME-1', 10.0),
+                ('USERNAME-1', 2.0),
+                ('USERNAME-1', 0.0),
+                ('USERNAME-2', 5.0)]):
+            journal = self.AccountJournal.create({
+                'name': 'Bank %s' % index,
+                'type': 'bank',
+                'code': 'BANK%s' % index,
+                'currency_id': self.currency_eur.id,
+                'bank_statements_source': 'online',
+                'online_bank_statement_provider': 'ua_pb_interpay',
+            })
+            provider = journal.online_bank_statement_provider_id
+            provider.write({
+                'username': username,
+                'ua_pb_interpay_rate_limit': rate_limit,
+            })
+            providers |= provider
+
+        self.assertEqual(
+            [
+                provider._ua_pb_interpay_get_rate_limit()
+                for provider in providers
+            ],
+            [2.0, 2.0, 2.0, 5.0],
+        )
+        rate_limiter = providers[0]._ua_pb_interpay_get_rate_limiter()
+        self.assertIs(
+            providers[2]._ua_pb_interpay_get_rate_limiter(),
+            rate_limiter,
+        )
+        self.assertIsNot(
+            providers[3]._ua_pb_interpay_get_rate_limiter(),
+            rate_limiter,
+        )
+        self.assertEqual(rate_limiter.burst, 2.0)
+
+        @contextmanager
+        def cursor():
+            yield self.env.cr
+
+        # NOTE: Limiters of the same login in different workers
+        rate_limiters = [
+            UaPbInterpaySharedRateLimiter(2.0, cursor, 'LOGIN')
+            for _worker in range(2)
+        ]
+        self.assertEqual(rate_limiters[0].try_acquire(), 0.0)
+        self.assertEqual(rate_limiters[1].try_acquire(), 0.0)
+        self.assertGreater(rate_limiters[0].try_acquire(), 0.0)
+        self.assertGreater(rate_limiters[1].try_acquire(), 0.0)
+
+    def test_shared_pages(self):
+        shared_pages = UaPbInterpaySharedPages({
+            'USERNAME-1': {1, 2, 3},
+            'USERNAME-2': {4},
+        })
+        shared_pages.put(('USERNAME-2', 0), {'list': []}, 4)
+        shared_pages.put(('USERNAME-1', 0), {'list': []}, 1)
+        shared_pages.put(('USERNAME-1', 1), {'list': []}, 1)
+        self.assertIsNone(shared_pages.get(('USERNAME-2', 0), 4))
+        self.assertIsNone(shared_pages.get(('USERNAME-1', 0), 1))
+        self.assertEqual(
+            shared_pages.get(('USERNAME-1', 0), 2),
+            {'list': []}
+        )
+        self.assertIsNone(shared_pages.get(('USERNAME-1', 0), 2))
+
+        # NOTE: Page is dropped once every provider of the login got it
+        page = {'list': []}
+        shared_pages.put(('USERNAME-1', 2), page, 1)
+        self.assertIs(shared_pages.get(('USERNAME-1', 2), 2), page)
+        self.assertIs(shared_pages.get(('USERNAME-1', 2), 3), page)
+        self.assertNotIn(('USERNAME-1', 2), shared_pages._pages)
+
+        # NOTE: Pages not taken by a provider are dropped once it's done
+        shared_pages.release(3)
+        self.assertIsNone(shared_pages.get(('USERNAME-1', 0), 3))
+        shared_pages.release(2)
+        self.assertEqual(shared_pages._pages, {})
+
+    def _ua_pb_interpay_response(self, headers, content):
+        response = mock.MagicMock()
+        response.__enter__.return_value = response
+        response.headers = headers
+        response.read.return_value = content
+        return response
@@ -0,0 +1,293 @@
+# Copyright 2026 CorporateHub (https://corporatehub.eu)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from base64 import b64encode
+import cProfile
+from datetime import datetime
+from email.message import Message
+import gc
+import json
+import logging
+import pstats
+import time
+import tracemalloc
+from unittest import mock
+from urllib.error import HTTPError
+
+from odoo.tests import common, tagged
+
+from ..models.online_bank_statement_provider_ua_pb_interpay import (
+    UaPbInterpayResponse,
+)
+from .report_generator import UaPbInterpayReportGenerator
+
+_logger = logging.getLogger(__name__)
+
+_module_ns = 'odoo.addons' \
+    '.account_bank_statement_import_online_ua_pb_interpay'
+_provider_class = (
+    _module_ns
+    + '.models.online_bank_statement_provider_ua_pb_interpay'
+    + '.OnlineBankStatementProviderUaPbInterpay'
+)
+
+
+@tagged('-standard', 'ua_pb_interpay_benchmark')
+class TestBenchmarkUaPbInterpay(common.TransactionCase):
+    """Run with --test-tags ua_pb_interpay_benchmark. Timings and memory
+    are only logged, as they depend on the machine, while requests, calls
+    and transactions held at once are asserted."""
+
+    sizes = (1000, 10000, 100000)
+    date_since = datetime(2020, 1, 1)
+    date_until = datetime(2020, 4, 1)
+
+    def setUp(self):
+        super().setUp()
+
+        bank_account = self.env['res.partner.bank'].create({
+            'acc_number': '19190000000000',
+            'partner_id': self.env.ref('base.main_partner').id,
+        })
+        journal = self.env['account.journal'].create({
+            'name': 'Bank',
+            'type': 'bank',
+            'code': 'BANK',
+            'currency_id': self.env.ref('base.EUR').id,
+            'bank_statements_source': 'online',
+            'online_bank_statement_provider': 'ua_pb_interpay',
+            'bank_account_id': bank_account.id,
+        })
+        self.provider = journal.online_bank_statement_provider_id
+        self.provider.write({
+            'username': 'username',
+            'password': 'password',
+            'certificate': b64encode(b'certificate'),
+        })
+
+    def _benchmark(self, name, count, function):
+        """Logs wall time, peak memory and number of Python function calls
+        per transaction of the function, each measured on a separate run.
+        Returns the number of calls per transaction."""
+        gc.collect()
+        started = time.perf_counter()
+        function()
+        wall_time = time.perf_counter() - started
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function()
+            _current, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        gc.collect()
+        profile = cProfile.Profile()
+        profile.runcall(function)
+        calls = pstats.Stats(profile).total_calls
+
+        _logger.info(
+            '%s of %s transactions: %.3f s, %.1f MiB peak,'
+            ' %.1f calls per transaction',
+            name,
+            count,
+            wall_time,
+            peak_memory / 1024 / 1024,
+            calls / count,
+        )
+        return calls / count
+
+    def _get_generator(self, count):
+        return UaPbInterpayReportGenerator(
+            self.provider.account_number,
+            self.date_since,
+            self.date_until,
+            count,
+        )
+
+    def _get_request(self, data):
+        return (
+            data['from'],
+            data['to'],
+            data['pagination']['page'],
+            data['pagination']['per'],
+        )
+
+    def _assert_requests(self, generator, requests):
+        """Asserts that every page of each report was requested once"""
+        self.assertTrue(requests)
+        self.assertEqual(len(set(requests)), len(requests))
+        expected_requests = set()
+        for date_from, date_to, _page, per in requests:
+            report = generator.get_report({
+                'from': date_from,
+                'to': date_to,
+                'pagination': {
+                    'page': 0,
+                    'per': per,
+                },
+            })
+            for page in range(report.get('pagination', {}).get('total', 1)):
+                expected_requests.add((date_from, date_to, page, per))
+        self.assertEqual(set(requests), expected_requests)
+
+    def _assert_calls(self, calls):
+        """Asserts that calls per transaction don't grow with the number of
+        transactions, i.e. the function is linear"""
+        self.assertLessEqual(
+            calls[max(self.sizes)],
+            calls[min(self.sizes)],
+        )
+
+    def test_get_transactions(self):
+        calls = {}
+        for count in self.sizes:
+            generator = self._get_generator(count)
+            requests = []
+
+            def retrieve(endpoint, data):
+                requests.append(self._get_request(data))
+                return generator.get_report(data)
+
+            with mock.patch(
+                _provider_class + '._ua_pb_interpay_retrieve',
+                side_effect=retrieve,
+            ):
+                self.provider._ua_pb_interpal_get_transactions(
+                    self.date_since,
+                    self.date_until,
+                )
+                self._assert_requests(generator, requests)
+                calls[count] = self._benchmark(
+                    '_ua_pb_interpal_get_transactions()',
+                    count,
+                    lambda: self.provider._ua_pb_interpal_get_transactions(
+                        self.date_since,
+                        self.date_until,
+                    ),
+                )
+        self._assert_calls(calls)
+
+    def test_obtain_statement_data(self):
+        calls = {}
+        for count in self.sizes:
+            generator = self._get_generator(count)
+            requests = []
+
+            def retrieve(endpoint, data):
+                requests.append(self._get_request(data))
+                return generator.get_report(data)
+
+            with mock.patch(
+                _provider_class + '._ua_pb_interpay_retrieve',
+                side_effect=retrieve,
+            ):
+                self.provider._obtain_statement_data(
+                    self.date_since,
+                    self.date_until,
+                )
+                self._assert_requests(generator, requests)
+                calls[count] = self._benchmark(
+                    '_obtain_statement_data()',
+                    count,
+                    lambda: self.provider._obtain_statement_data(
+                        self.date_since,
+                        self.date_until,
+                    ),
+                )
+        self._assert_calls(calls)
+
+    def test_retrieve(self):
+        challenges = []
+
+        def urlopen(request, **kwargs):
+            if not request.get_header('Authorization'):
+                challenges.append(request.full_url)
+                raise HTTPError(request.full_url, 401, 'Unauthorized', {
+                    'WWW-Authenticate':
+                        'Digest realm="InterPay", nonce="NONCE",'
+                        ' qop="auth", algorithm="MD5"',
+                }, None)
+            data = json.loads(request.data.decode('utf-8'))
+            requests.append(self._get_request(data))
+            headers = Message()
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+            return UaPbInterpayResponse(
+                200,
+                'OK',
+                headers,
+                generator.get_content(data),
+            )
+
+        calls = {}
+        for count in self.sizes:
+            generator = self._get_generator(count)
+            requests = []
+            with mock.patch(
+                _provider_class + '._ua_pb_interpay_get_ssl_context',
+            ), mock.patch(
+                _provider_class + '._ua_pb_interpay_urlopen',
+                side_effect=urlopen,
+            ):
+                self.provider._obtain_statement_data(
+                    self.date_since,
+                    self.date_until,
+                )
+                self._assert_requests(generator, requests)
+                calls[count] = self._benchmark(
+                    '_obtain_statement_data() with Digest auth',
+                    count,
+                    lambda: self.provider._obtain_statement_data(
+                        self.date_since,
+                        self.date_until,
+                    ),
+                )
+        self._assert_calls(calls)
+        # NOTE: Nonce is reused by every request of every pull
+        self.assertLessEqual(len(challenges), 1)
+
+    def test_stream_lines(self):
+        get_page_entries = type(self.provider)._ua_pb_interpay_get_page_entries
+        # NOTE: Transactions held at once, and the most of them ever held
+        held = [0, 0]
+
+        def hold_page_entries(provider, *args):
+            entries = get_page_entries(provider, *args)
+            held[0] += len(entries)
+            held[1] = max(held)
+            return entries
+
+        calls = {}
+        for count in self.sizes:
+            generator = self._get_generator(count)
+
+            def stream_lines():
+                held[:] = [0, 0]
+                lines = 0
+                for _line in self.provider._ua_pb_interpay_stream_lines(
+                        self.date_since,
+                        self.date_until):
+                    lines += 1
+                    held[0] -= 1
+                return lines
+
+            with mock.patch(
+                _provider_class + '._ua_pb_interpay_retrieve',
+                side_effect=lambda endpoint, data: generator.get_report(data),
+            ), mock.patch(
+                _provider_class + '._ua_pb_interpay_get_page_entries',
+                autospec=True,
+                side_effect=hold_page_entries,
+            ):
+                lines = stream_lines()
+                # NOTE: Only transactions of one window are held at once
+                self.assertTrue(lines)
+                self.assertLess(held[1], lines)
+                self.assertEqual(held[0], 0)
+                calls[count] = self._benchmark(
+                    '_ua_pb_interpay_stream_lines()',
+                    count,
+                    stream_lines,
+                )
+        self._assert_calls(calls)
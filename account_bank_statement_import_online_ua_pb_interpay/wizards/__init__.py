@@ -0,0 +1,4 @@
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
+
+from . import online_bank_statement_pull_wizard
+from . import ua_pb_interpay_export_import_wizard
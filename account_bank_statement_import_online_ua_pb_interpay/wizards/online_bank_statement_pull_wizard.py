@@ -0,0 +1,39 @@
+# Copyright 2026 CorporateHub (https://corporatehub.eu)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from odoo import api, fields, models
+
+
+class OnlineBankStatementPullWizard(models.TransientModel):
+    _inherit = 'online.bank.statement.pull.wizard'
+
+    ua_pb_interpay_background = fields.Boolean(
+        string='In Background',
+        help=(
+            'Pull statements of InterPay providers in background, one 30-day'
+            ' window at a time, instead of waiting for the whole period to be'
+            ' pulled. Progress is shown on the provider as Backfilled Until.'
+        ),
+    )
+
+    @api.multi
+    def action_pull(self):
+        self.ensure_one()
+        if not self.ua_pb_interpay_background:
+            return super().action_pull()
+        providers = self.with_context(
+            active_test=False,
+        ).provider_ids
+        background_providers = providers.filtered(
+            lambda provider: provider.service == 'ua_pb_interpay'
+        )
+        background_providers._ua_pb_interpay_start_backfill(
+            self.date_since,
+            self.date_until,
+        )
+        if providers - background_providers:
+            (providers - background_providers)._pull(
+                self.date_since,
+                self.date_until,
+            )
+        return {'type': 'ir.actions.act_window_close'}
@@ -0,0 +1,76 @@
+# Copyright 2026 CorporateHub (https://corporatehub.eu)
+# License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl.html).
+
+from base64 import b64decode
+from io import BytesIO
+
+from odoo import api, fields, models
+
+
+class UaPbInterpayExportImportWizard(models.TransientModel):
+    _name = 'ua.pb.interpay.export.import.wizard'
+    _description = 'InterPay Export Import Wizard'
+
+    provider_id = fields.Many2one(
+        string='Provider',
+        comodel_name='online.bank.statement.provider',
+        required=True,
+        ondelete='cascade',
+    )
+    data_file = fields.Binary(
+        string='Export File',
+        required=True,
+        attachment=True,
+        help='InterPay export in JSON (same as API report) or CSV format',
+    )
+    filename = fields.Char()
+    file_format = fields.Selection(
+        selection=[
+            ('json', 'JSON'),
+            ('csv', 'CSV'),
+        ],
+        string='Format',
+        default='json',
+        required=True,
+    )
+    date_since = fields.Datetime(
+        string='Since',
+        help='Transactions before this date are skipped',
+    )
+    date_until = fields.Datetime(
+        string='Until',
+        help='Transactions at or after this date are skipped',
+    )
+
+    @api.onchange('filename')
+    def _onchange_filename(self):
+        if self.filename and self.filename.lower().endswith('.csv'):
+            self.file_format = 'csv'
+        elif self.filename and self.filename.lower().endswith('.json'):
+            self.file_format = 'json'
+
+    @api.multi
+    def action_import(self):
+        self.ensure_one()
+        with self._open_data_file() as file:
+            self.provider_id._ua_pb_interpay_import_export(
+                file,
+                file_format=self.file_format,
+                date_since=self.date_since,
+                date_until=self.date_until,
+            )
+        return {'type': 'ir.actions.act_window_close'}
+
+    @api.multi
+    def _open_data_file(self):
+        """Returns the uploaded file opened for reading, straight from the
+        filestore if it's stored there, not to load it into memory"""
+        self.ensure_one()
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'data_file'),
+        ], limit=1)
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        return BytesIO(b64decode(self.data_file))